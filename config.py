@@ -1,96 +1,94 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from config_store import ConfigStore, StoredDict
+
 # INSTAGRAM REEL SCRAPPER SETTINGS
 INST_REAL_SCRAPER_ACTOR_ID = 'xMc5Ga1oCONPmWJIa'
+SCRAPER_MAX_CONCURRENCY = 4      # Максимальное количество одновременных запусков актора
+SCRAPER_ACCOUNTS_PER_RUN = 1     # Количество аккаунтов в одном запуске актора
+DATASET_PAGE_SIZE = 1000         # Размер страницы при потоковой загрузке датасета
+# Отметки последних reels для инкрементального сбора
+SCRAPE_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_data', 'scrape_state.json')
+
+# Профили аккаунтов (количество подписчиков для engagement-метрик)
+INST_PROFILE_SCRAPER_ACTOR_ID = 'apify/instagram-profile-scraper'
+PROFILE_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_data', 'profile_cache.json')
+PROFILE_CACHE_TTL_SECONDS = 24 * 60 * 60      # Подписчики обновляются не чаще раза в сутки
+DEFAULT_FOLLOWERS = 10000        # Для аккаунтов, чей профиль не удалось получить
+
+# Кэш результатов прогонов актора
+RUN_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_data', 'run_cache')
+RUN_CACHE_TTL_SECONDS = 6 * 60 * 60           # Время, в течение которого результат прогона считается свежим
+RUN_CACHE_MAX_BYTES = 500 * 1024 * 1024       # Максимальный размер кэша на диске
+
+# Квота и частота запусков актора
+APIFY_USAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_data', 'apify_usage.json')
+APIFY_MONTHLY_BUDGET_USD = 5.0   # Месячный бюджет Apify; прогоны сверх него отклоняются до запуска
+APIFY_COST_PER_RESULT = 0.0026   # Оценка стоимости одного reel в USD
+APIFY_COST_PER_RUN = 0.005       # Оценка фиксированной стоимости запуска актора в USD
+APIFY_RATE_PER_SECOND = 1.0      # Среднее количество запусков актора в секунду
+APIFY_RATE_BURST = 4             # Количество запусков подряд без ожидания
+APIFY_MAX_RETRIES = 3            # Повторы при временных ошибках (429, 5xx, сеть)
+
+# Колоночное хранилище датасетов (Parquet, партиции по аккаунту и месяцу)
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_data', 'store')
+INGEST_CHUNK_ROWS = 50_000       # Размер блока при потоковом чтении сырых reels (CSV и Parquet)
+# Накопленные count/mean/M2 по аккаунтам и метрикам для инкрементального пересчета z-score
+RUNNING_STATS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_data', 'running_stats.parquet')
+# Скетчи квантилей по аккаунтам и метрикам для перцентилей и IQR в дашборде
+QUANTILE_SKETCH_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_data', 'quantile_sketches.parquet')
+QUANTILE_SKETCH_COMPRESSION = 100   # Чем больше, тем точнее и крупнее скетч
+QUANTILE_EXACT_MAX = 1000           # Аккаунты с таким числом reels и меньше хранятся точно
+# Сводка по аккаунтам (суммы, средние, медианы и доли) для вкладки общей статистики
+ACCOUNT_SUMMARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_data', 'account_summary.parquet')
+# Параллельный расчет метрик: аккаунты делятся на шарды по crc32 имени
+PROCESS_WORKERS = 1              # Количество процессов; 1 — расчет в текущем процессе
+PROCESS_SHARD_ACCOUNTS = 100     # Среднее количество аккаунтов в одном шарде
+# Кэш данных дашборда в памяти (общий для всех сессий, ключ — версия файла)
+DASHBOARD_CACHE_ENTRIES = 32     # Максимальное количество закэшированных наборов на каждый загрузчик
+ACCOUNT_INDEX_CACHE_ENTRIES = 2  # Версий полного набора с индексом аккаунтов в памяти: текущая и предыдущая
+CHART_MAX_POINTS = 2000          # Точек на линию графика; длинные ряды прореживаются LTTB
+CHART_CACHE_ENTRIES = 64         # Максимальное количество закэшированных графиков
+VIDEO_PAGE_SIZE = 9              # Видео-карточек на странице; плееры загружаются только по запросу
 
-# Настройки анализа аккаунтов
-reels_input_data = {
+# Настройки анализа аккаунтов по умолчанию. Текущие значения хранятся в
+# settings.json и меняются через update_accounts без перезагрузки модуля
+DEFAULT_REELS_INPUT_DATA = {
     "username": ['johnkeeganlifestyle'],  # Список аккаунтов для анализа
     "resultsLimit": 5,          # Максимальное количество результатов
     "scrapePosts": False,         # Анализировать посты
     "scrapeReels": True,          # Анализировать reels
     "scrapeStories": False        # Анализировать stories
 }
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'settings.json')
 
-def save_config():
-    """Сохраняет текущую конфигурацию в файл"""
-    import traceback
+
+def validate_reels_input(reels_input):
+    """Проверяет настройки анализа перед сохранением"""
+    if not isinstance(reels_input.get("username"), list):
+        raise ValueError(f"username должен быть списком, получено: {type(reels_input.get('username'))}")
+    
+    if not isinstance(reels_input.get("resultsLimit"), (int, float)):
+        raise ValueError(f"resultsLimit должен быть числом, получено: {type(reels_input.get('resultsLimit'))}")
     
-    try:
-        # Создаем бэкап текущего файла
-        with open(__file__, 'r') as f:
-            original_content = f.read()
-        
-        with open(__file__ + '.bak', 'w') as f:
-            f.write(original_content)
-        
-        # Проверяем значения перед сохранением
-        if not isinstance(reels_input_data.get("username"), list):
-            raise ValueError(f"username должен быть списком, получено: {type(reels_input_data.get('username'))}")
-        
-        if not isinstance(reels_input_data.get("resultsLimit"), (int, float)):
-            raise ValueError(f"resultsLimit должен быть числом, получено: {type(reels_input_data.get('resultsLimit'))}")
-        
-        results_limit = int(reels_input_data["resultsLimit"])
-        if results_limit < 1 or results_limit > 500:
-            raise ValueError(f"resultsLimit должен быть от 1 до 500, получено: {results_limit}")
-        
-        # Находим начало и конец блока конфигурации
-        lines = original_content.split('\n')
-        config_start = -1
-        config_end = -1
-        
-        for i, line in enumerate(lines):
-            if line.strip() == 'reels_input_data = {':
-                config_start = i
-            elif config_start >= 0 and line.strip() == '}':
-                config_end = i
-                break
-        
-        if config_start == -1 or config_end == -1:
-            raise ValueError("Не удалось найти блок конфигурации в файле")
-        
-        # Создаем новый блок конфигурации
-        new_config = [
-            'reels_input_data = {',
-            f'    "username": {reels_input_data["username"]},  # Список аккаунтов для анализа',
-            f'    "resultsLimit": {results_limit},          # Максимальное количество результатов',
-            '    "scrapePosts": False,         # Анализировать посты',
-            '    "scrapeReels": True,          # Анализировать reels',
-            '    "scrapeStories": False        # Анализировать stories',
-            '}'
-        ]
-        
-        # Заменяем старый блок конфигурации на новый
-        new_content = '\n'.join(lines[:config_start] + new_config + lines[config_end + 1:])
-        
-        # Проверяем, что новый контент валидный Python код
-        try:
-            compile(new_content, __file__, 'exec')
-        except SyntaxError as se:
-            raise ValueError(f"Новая конфигурация содержит синтаксические ошибки: {str(se)}")
-        
-        # Сохраняем обновленный контент
-        with open(__file__, 'w') as f:
-            f.write(new_content)
-            
-    except Exception as e:
-        # В случае ошибки восстанавливаем из бэкапа
-        error_details = f"Ошибка: {str(e)}\n\nТекущие значения:\n"
-        error_details += f"username: {reels_input_data.get('username')} ({type(reels_input_data.get('username'))})\n"
-        error_details += f"resultsLimit: {reels_input_data.get('resultsLimit')} ({type(reels_input_data.get('resultsLimit'))})\n"
-        error_details += f"\nПолный стек ошибки:\n{traceback.format_exc()}"
-        
-        try:
-            import os
-            if os.path.exists(__file__ + '.bak'):
-                with open(__file__ + '.bak', 'r') as f:
-                    backup_content = f.read()
-                with open(__file__, 'w') as f:
-                    f.write(backup_content)
-                error_details += "\n\nКонфигурация восстановлена из бэкапа."
-        except Exception as restore_error:
-            error_details += f"\n\nОшибка при восстановлении из бэкапа: {str(restore_error)}"
-        
-        raise ValueError(error_details)
+    results_limit = int(reels_input["resultsLimit"])
+    if results_limit < 1 or results_limit > 500:
+        raise ValueError(f"resultsLimit должен быть от 1 до 500, получено: {results_limit}")
+
+
+def _validate_settings(settings):
+    validate_reels_input(settings["reels_input_data"])
+
+
+settings_store = ConfigStore(SETTINGS_PATH, defaults={"reels_input_data": DEFAULT_REELS_INPUT_DATA})
+reels_input_data = StoredDict(settings_store, "reels_input_data", validate=_validate_settings)
+
+def save_config():
+    """Сохраняет текущую конфигурацию в файл настроек"""
+    settings_store.update({"reels_input_data": dict(reels_input_data)}, validate=_validate_settings)
 
 def update_accounts(accounts, results_limit=None):
     """Обновляет настройки анализа и сохраняет их в файл
@@ -99,28 +97,69 @@ def update_accounts(accounts, results_limit=None):
         accounts (list): Список аккаунтов для анализа
         results_limit (int, optional): Количество последних постов для анализа
     """
-    global reels_input_data
-    reels_input_data["username"] = accounts
+    changes = {"username": list(accounts)}
     if results_limit is not None:
-        reels_input_data["resultsLimit"] = results_limit
+        changes["resultsLimit"] = int(results_limit)
     
-    # Сохраняем изменения в файл
-    save_config()
+    # Изменения применяются атомарно и сразу видны во всех сессиях
+    reels_input_data.update_values(changes)
+
+# База для z-score: 'account' — относительно reels того же аккаунта, 'global' — относительно всех reels
+ZSCORE_BASELINE = 'account'
+# Скользящие окна (в днях) для базовых уровней μ и σ аккаунта перед каждым reel
+BASELINE_WINDOWS_DAYS = [30, 60, 90, 180]
 
 stdev_hot_treshold = 2
 stdev_very_successful_treshold = 0.75
 
+# Категории по z-score от лучшей к худшей: (метка, порог, включая порог)
+Z_CATEGORY_THRESHOLDS = [
+    ('🔥viral hit', 2.0, False),
+    ('✅very successful', 1.0, False),
+    ('successful', 0.2, False),
+    ('average', -1.0, True),
+]
+Z_CATEGORY_DEFAULT = 'weak'   # Ниже всех порогов и NaN
+
+# Общий словарь категорий для всех mark*-колонок, от худшей к лучшей
+Z_CATEGORIES = [Z_CATEGORY_DEFAULT] + [label for label, _, _ in reversed(Z_CATEGORY_THRESHOLDS)]
+Z_CATEGORY_DTYPE = pd.CategoricalDtype(Z_CATEGORIES, ordered=True)
+
+# Границы для np.searchsorted(side='left'): код категории равен количеству
+# границ строго меньше z, поэтому включаемый порог сдвигается на один ulp вниз
+_Z_CATEGORY_EDGES = np.array([
+    np.nextafter(threshold, -np.inf) if inclusive else threshold
+    for _, threshold, inclusive in reversed(Z_CATEGORY_THRESHOLDS)
+])
+
 def z_categorize(z):
-    if z > 2.0:
-        return '🔥viral hit'
-    elif z > 1.0:
-        return '✅very successful'
-    elif z > 0.2:
-        return 'successful'
-    elif z >= -1.0:
-        return 'average'
-    else:
-        return 'weak'
+    for label, threshold, inclusive in Z_CATEGORY_THRESHOLDS:
+        if z >= threshold if inclusive else z > threshold:
+            return label
+    return Z_CATEGORY_DEFAULT
+
+def z_category_codes(z):
+    """Векторная версия z_categorize: коды категорий Z_CATEGORY_DTYPE для массива z-score любой формы"""
+    z = np.asarray(z, dtype='float64')
+    codes = np.searchsorted(_Z_CATEGORY_EDGES, z, side='left').astype(np.int8)
+    codes[np.isnan(z)] = 0
+    return codes
+
+def z_categorize_columns(df, z_columns):
+    """Категоризирует несколько колонок z-score за один проход
+    
+    Args:
+        df (pd.DataFrame): данные с колонками z-score
+        z_columns (list): колонки для категоризации
+    
+    Returns:
+        dict: {колонка: pd.Categorical} с общим словарем Z_CATEGORY_DTYPE
+    """
+    codes = z_category_codes(df[list(z_columns)].to_numpy(dtype='float64', na_value=np.nan))
+    return {
+        column: pd.Categorical.from_codes(codes[:, i], dtype=Z_CATEGORY_DTYPE)
+        for i, column in enumerate(z_columns)
+    }
 
 top_reels_count = 15
 bad_reels_count = 5
@@ -0,0 +1,161 @@
+"""
+Хранилище изменяемых настроек в JSON-файле.
+
+Запись идет под файловой блокировкой через временный файл и атомарное
+переименование, поэтому параллельные сессии дашборда не теряют изменения
+друг друга и никогда не видят недописанный файл. Чтение обслуживается из
+памяти: файл перечитывается только если изменились его mtime, размер или inode.
+"""
+
+import copy
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from collections.abc import MutableMapping
+
+try:
+    import fcntl
+except ImportError:  # Windows: остается только атомарная замена файла
+    fcntl = None
+
+
+class ConfigStore:
+    """Настройки в JSON-файле с атомарной записью и кэшем чтения
+
+    Args:
+        path (str): путь к файлу настроек
+        defaults (dict): значения по умолчанию для отсутствующих ключей
+    """
+
+    def __init__(self, path, defaults=None):
+        self.path = path
+        self.defaults = defaults or {}
+        self._lock = threading.RLock()
+        self._signature = None
+        self._data = None
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load(self):
+        data = copy.deepcopy(self.defaults)
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                data.update(json.load(f))
+        return data
+
+    @contextmanager
+    def _file_lock(self):
+        """Межпроцессная блокировка на время чтения-изменения-записи"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def changed(self):
+        """Изменился ли файл с момента последнего чтения"""
+        return self._stat_signature() != self._signature
+
+    def read(self):
+        """Возвращает актуальные настройки; файл перечитывается только при изменении
+
+        Возвращаемый dict общий для всех читателей и не должен изменяться.
+        """
+        with self._lock:
+            signature = self._stat_signature()
+            if self._data is None or signature != self._signature:
+                self._data = self._load()
+                self._signature = signature
+            return self._data
+
+    def get(self, key, default=None):
+        return self.read().get(key, default)
+
+    def modify(self, func, validate=None):
+        """Атомарно изменяет настройки функцией func(data)
+
+        Args:
+            func (callable): изменяет переданный dict настроек на месте
+            validate (callable, optional): проверяет итоговые настройки,
+                при ошибке должен выбросить исключение — файл не меняется
+
+        Returns:
+            dict: сохраненные настройки
+        """
+        with self._lock, self._file_lock():
+            # Перечитываем под блокировкой, чтобы не затереть чужие изменения
+            data = self._load()
+            func(data)
+            if validate is not None:
+                validate(data)
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(suffix='.json', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            self._data = data
+            self._signature = self._stat_signature()
+            return data
+
+    def update(self, changes, validate=None):
+        """Атомарно заменяет значения ключей верхнего уровня"""
+        return self.modify(lambda data: data.update(copy.deepcopy(changes)), validate)
+
+
+class StoredDict(MutableMapping):
+    """Словарь, который читается из ConfigStore при каждом обращении
+
+    Используется для настроек, которые импортируются как обычный dict
+    (``from config import reels_input_data``), но должны меняться без
+    перезагрузки модуля.
+    """
+
+    def __init__(self, store, key, validate=None):
+        self._store = store
+        self._key = key
+        self._validate = validate
+
+    def _current(self):
+        return self._store.read()[self._key]
+
+    def __getitem__(self, item):
+        return copy.deepcopy(self._current()[item])
+
+    def __setitem__(self, item, value):
+        self.update_values({item: value})
+
+    def __delitem__(self, item):
+        self._store.modify(lambda data: data[self._key].pop(item), self._validate)
+
+    def __iter__(self):
+        return iter(self._current())
+
+    def __len__(self):
+        return len(self._current())
+
+    def update_values(self, values):
+        """Атомарно меняет несколько значений за одну запись"""
+        values = copy.deepcopy(values)
+        self._store.modify(lambda data: data[self._key].update(values), self._validate)
+
+    def __repr__(self):
+        return repr(self._current())
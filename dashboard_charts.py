@@ -0,0 +1,124 @@
+"""
+Графики метрик по времени для дашборда.
+
+Все линейные графики строятся одной функцией time_series_chart() из
+уже отсортированных reels аккаунта (dashboard_data.load_account) и
+кэшируются по аккаунту, метрике и версии данных. Длинные ряды прореживаются
+алгоритмом LTTB (Largest-Triangle-Three-Buckets) до CHART_MAX_POINTS точек:
+он сохраняет пики и провалы, поэтому форма графика не меняется, а размер
+данных, отправляемых в браузер, не растет с количеством reels.
+"""
+
+import numpy as np
+import plotly.express as px
+import streamlit as st
+
+import dashboard_data
+from config import CHART_CACHE_ENTRIES, CHART_MAX_POINTS
+
+# Кнопки выбора периода на оси времени
+RANGE_BUTTONS = [
+    dict(step="all", label="Все"),
+    dict(count=30, label="30д", step="day", stepmode="backward"),
+    dict(count=60, label="60д", step="day", stepmode="backward"),
+    dict(count=90, label="90д", step="day", stepmode="backward"),
+    dict(count=180, label="180д", step="day", stepmode="backward")
+]
+
+
+def lttb_indices(x, y, max_points):
+    """Индексы точек, которые оставляет LTTB
+
+    Первая и последняя точки сохраняются, остальные делятся на max_points - 2
+    корзины; из каждой берется точка, образующая наибольший треугольник с
+    предыдущей выбранной точкой и средним следующей корзины.
+
+    Args:
+        x, y (np.ndarray): координаты, x по возрастанию, без NaN
+        max_points (int): сколько точек оставить
+
+    Returns:
+        np.ndarray: индексы выбранных точек по возрастанию
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype='float64') - x[0]
+    y = np.asarray(y, dtype='float64')
+    # Начала корзин; последнее начало — последняя точка
+    starts = (np.floor(np.arange(max_points - 1) * (n - 2) / (max_points - 2)) + 1).astype(np.int64)
+    sizes = np.diff(np.r_[starts, n])
+    mean_x = np.add.reduceat(x, starts) / sizes
+    mean_y = np.add.reduceat(y, starts) / sizes
+
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    selected = 0
+    for i in range(max_points - 2):
+        lo, hi = starts[i], starts[i + 1]
+        ax, ay = x[selected], y[selected]
+        area = np.abs((ax - mean_x[i + 1]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (mean_y[i + 1] - ay))
+        selected = lo + int(np.argmax(area))
+        indices[i + 1] = selected
+    return indices
+
+
+def downsample(df, column, max_points=CHART_MAX_POINTS):
+    """Строки df, оставленные LTTB для колонки column; строки с NaN отбрасываются"""
+    df = df[df[column].notna()]
+    x = df['timestamp'].to_numpy(dtype='datetime64[ns]').astype('int64')
+    return df.iloc[lttb_indices(x, df[column].to_numpy(dtype='float64'), max_points)]
+
+
+@st.cache_data(max_entries=CHART_CACHE_ENTRIES, show_spinner=False)
+def time_series_chart(account, column, version, title, color, y_title=None, threshold_lines=(),
+                      max_points=CHART_MAX_POINTS):
+    """Линейный график колонки по времени для аккаунта
+
+    Args:
+        account (str): аккаунт
+        column (str): колонка reels аккаунта, в том числе ряд из DASHBOARD_METRICS
+        version: версия данных (dashboard_data.data_version()), ключ кэша
+        title (str): заголовок графика
+        color (str): цвет линии
+        y_title (str, optional): подпись оси Y
+        threshold_lines (tuple): скользящие пороги (mean_column, std_column, k, цвет, подпись):
+            линия mean + k·std по порогам, посчитанным при обработке
+        max_points (int): максимум точек на линию
+
+    Returns:
+        plotly.graph_objects.Figure
+    """
+    # Reels отсортированы от новых к старым; разворот дает порядок по времени без сортировки
+    df = dashboard_data.load_account(account).iloc[::-1]
+
+    fig = px.line(
+        downsample(df, column, max_points),
+        x='timestamp',
+        y=column,
+        title=title,
+        markers=True
+    )
+    fig.update_traces(
+        line=dict(color=color),
+        marker=dict(color='white', size=8, line=dict(width=2, color=color))
+    )
+    fig.update_layout(
+        xaxis=dict(rangeselector=dict(buttons=RANGE_BUTTONS)),
+        yaxis=dict(autorange=True, title=y_title) if y_title else dict(autorange=True)
+    )
+
+    for mean_column, std_column, k, line_color, label in threshold_lines:
+        if mean_column not in df.columns:
+            continue
+        line = df.assign(threshold=df[mean_column] + k * df[std_column])
+        line = downsample(line, 'threshold', max_points)
+        fig.add_scatter(
+            x=line['timestamp'],
+            y=line['threshold'],
+            mode='lines',
+            line=dict(color=line_color, dash='dash', width=2, shape='hv'),
+            name=label
+        )
+    return fig
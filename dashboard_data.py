@@ -0,0 +1,183 @@
+"""
+Слой данных дашборда.
+
+Streamlit выполняет streamlit_dashboard.py целиком при каждом действии
+пользователя. Загрузчики этого модуля кэшируются через st.cache_data и
+st.cache_resource (кэш общий для всех сессий) с ключом «путь + версия
+файла»: чтение с диска, приведение типов и группировка по аккаунтам
+(AccountIndex) выполняются один раз на версию данных, а выбор аккаунта —
+срез индекса без копирования. Когда
+конвейер записывает новые данные, версия меняется и следующий запуск читает
+их заново; clear_cache() сразу освобождает память от устаревших версий.
+Количество закэшированных наборов ограничено DASHBOARD_CACHE_ENTRIES и
+ACCOUNT_INDEX_CACHE_ENTRIES для полного набора с индексом.
+"""
+
+import os
+
+import pandas as pd
+import streamlit as st
+
+from config import (ACCOUNT_INDEX_CACHE_ENTRIES, ACCOUNT_SUMMARY_PATH, BASELINE_WINDOWS_DAYS, DASHBOARD_CACHE_ENTRIES,
+                    QUANTILE_SKETCH_PATH)
+from data_loader.account_index import AccountIndex
+from data_loader.schema import compact
+from data_loader.storage import described_store, reels_store
+from external_analysis.account_summary import account_summary, load_summary
+from external_analysis.derived_metrics import DASHBOARD_METRICS, computable, evaluate
+from external_analysis.quantile_sketch import load_sketches
+from external_analysis.rolling_baselines import baseline_columns
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_data', 'sample_data.csv')
+
+# Колонки, которые использует дашборд — остальные не читаются с диска
+DASHBOARD_COLUMNS = [
+    'accountName', 'timestamp', 'videoPlayCount', 'likesCount', 'commentsCount',
+    'likeRate', 'commentRate', 'url', 'videoUrl', 'displayUrl',
+    'markcomments', 'marklikes', 'markvideoPlay', 'markvideoDuration',
+    'markengagementR', 'markcommentR', 'marklikeR', 'markperformanceScore'
+] + [
+    column
+    for metric in ['likesCount', 'commentsCount', 'videoPlayCount']
+    for window in BASELINE_WINDOWS_DAYS
+    for column in baseline_columns(metric, window)
+]
+
+
+def file_version(path):
+    """Версия файла: (mtime_ns, size) или None, если файла нет"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _index(df):
+    """Ряды DASHBOARD_METRICS, компактные типы и индекс аккаунтов (reels от новых к старым)
+
+    Ряды, для которых в данных нет исходных колонок (например, в хранилище
+    без reels), не вычисляются.
+    """
+    df = evaluate(df, computable([metric.name for metric in DASHBOARD_METRICS], df.columns))
+    return AccountIndex(compact(df))
+
+
+# --- Кэшируемые загрузчики; version входит в ключ кэша ---
+
+# Индекс — общий объект без копирования при каждом запуске скрипта; его срезы только читаются
+@st.cache_resource(max_entries=ACCOUNT_INDEX_CACHE_ENTRIES, show_spinner=False)
+def _store_index(root, version):
+    store = described_store(root)
+    available = set(store.schema().names)
+    return _index(store.read(columns=[c for c in DASHBOARD_COLUMNS if c in available]))
+
+
+@st.cache_resource(max_entries=ACCOUNT_INDEX_CACHE_ENTRIES, show_spinner=False)
+def _sample_index(path, version):
+    return _index(pd.read_csv(path))
+
+
+@st.cache_data(max_entries=DASHBOARD_CACHE_ENTRIES, show_spinner=False)
+def _account_sketches(path, version, account):
+    return load_sketches(path, accounts=[account])
+
+
+@st.cache_data(max_entries=DASHBOARD_CACHE_ENTRIES, show_spinner=False)
+def _summary(path, version):
+    return load_summary(path)
+
+
+LOADERS = (_store_index, _sample_index, _account_sketches, _summary)
+
+
+def clear_cache():
+    """Сбрасывает кэш загрузчиков, например после запуска конвейера"""
+    for loader in LOADERS:
+        loader.clear()
+
+
+# --- Интерфейс для дашборда ---
+
+def ensure_processed():
+    """Генерирует обработанные данные, если их нет, а сырые есть
+
+    Returns:
+        bool: запускалась ли обработка
+    """
+    if described_store().exists():
+        return False
+    from external_analysis.descriptive_stat import DATA_PATH, process_data
+    if not (reels_store().exists() or os.path.exists(DATA_PATH)):
+        return False
+    process_data()
+    clear_cache()
+    return True
+
+
+def uses_sample():
+    """Показываются ли демонстрационные данные вместо обработанных
+
+    Raises:
+        FileNotFoundError: нет ни обработанных данных, ни sample_data.csv
+    """
+    if described_store().exists():
+        return False
+    if os.path.exists(SAMPLE_PATH):
+        return True
+    raise FileNotFoundError("Отсутствуют как обработанные данные, так и sample_data.csv")
+
+
+def account_index():
+    """Индекс аккаунтов показываемых данных, строится один раз на версию данных"""
+    if uses_sample():
+        return _sample_index(SAMPLE_PATH, file_version(SAMPLE_PATH))
+    store = described_store()
+    return _store_index(store.root, store.version())
+
+
+def list_accounts():
+    """Аккаунты, доступные для просмотра, по алфавиту"""
+    return account_index().accounts
+
+
+def data_version():
+    """Версия показываемых данных; меняется при каждой записи конвейера"""
+    if uses_sample():
+        return file_version(SAMPLE_PATH)
+    return described_store().version()
+
+
+def load_account(account):
+    """Колонки DASHBOARD_COLUMNS и ряды DASHBOARD_METRICS reels аккаунта, от новых к старым
+
+    Срез общего индекса без копирования: результат только читается.
+    """
+    return account_index().rows(account)
+
+
+def load_account_sketches(account):
+    """Скетчи квантилей аккаунта: {(аккаунт, метрика): QuantileSketch}; пусто для демо-данных"""
+    version = file_version(QUANTILE_SKETCH_PATH)
+    if version is None or uses_sample():
+        return {}
+    return _account_sketches(QUANTILE_SKETCH_PATH, version, account)
+
+
+def load_account_summary(account):
+    """Сводка аккаунта (строка account_summary): из таблицы, записанной при обработке,
+    или по reels аккаунта, если таблицы нет или в ней нет аккаунта
+
+    Returns:
+        pd.Series или None, если аккаунт не выбран или у него нет reels
+    """
+    if account is None:
+        return None
+    version = file_version(ACCOUNT_SUMMARY_PATH)
+    summary = None if version is None or uses_sample() else _summary(ACCOUNT_SUMMARY_PATH, version)
+    if summary is None or account not in summary.index:
+        reels = load_account(account)
+        if reels.empty:
+            return None
+        summary = account_summary(reels)
+    return summary.loc[account]
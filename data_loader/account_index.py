@@ -0,0 +1,50 @@
+"""
+Индекс аккаунтов для быстрого выбора reels одного аккаунта.
+
+AccountIndex один раз переупорядочивает DataFrame так, что строки каждого
+аккаунта лежат подряд (внутри аккаунта — от новых reels к старым), и
+запоминает границы (start, stop) каждого аккаунта. Выбор аккаунта после
+этого — срез iloc[start:stop] без сравнения строк и без копирования данных,
+а отсортированный список аккаунтов не требует unique() по всем строкам.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class AccountIndex:
+    """Строки DataFrame, сгруппированные по аккаунту, со смещениями аккаунтов
+
+    Args:
+        df (pd.DataFrame): данные reels
+        account_column (str): колонка с именем аккаунта; строки без аккаунта отбрасываются
+        time_column (str): колонка времени публикации для порядка внутри аккаунта
+    """
+
+    def __init__(self, df, account_column='accountName', time_column='timestamp'):
+        codes, accounts = pd.factorize(df[account_column], sort=True)
+        keys = [codes]
+        if time_column in df.columns:
+            # ~t убывает с ростом t без переполнения; NaT (минимальное int64) уходит в конец аккаунта
+            keys.insert(0, ~df[time_column].to_numpy(dtype='datetime64[ns]').view('int64'))
+        order = np.lexsort(keys)
+        order = order[codes[order] >= 0]
+
+        bounds = np.searchsorted(codes[order], np.arange(len(accounts) + 1))
+        self.frame = df.take(order)
+        self.accounts = [str(account) for account in accounts]
+        self.offsets = {
+            account: (int(start), int(stop))
+            for account, start, stop in zip(self.accounts, bounds[:-1], bounds[1:])
+        }
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __contains__(self, account):
+        return account in self.offsets
+
+    def rows(self, account):
+        """Reels аккаунта от новых к старым: срез без копирования; пустой, если аккаунта нет"""
+        start, stop = self.offsets.get(account, (0, 0))
+        return self.frame.iloc[start:stop]
@@ -0,0 +1,180 @@
+"""
+Планировщик вызовов актора Apify с учетом квоты и частоты запросов.
+
+Перед запуском прогона оценивается его стоимость по числу аккаунтов и
+resultsLimit и резервируется из месячного бюджета; если бюджета не хватает,
+прогон отклоняется до обращения к Apify. Частота запусков ограничивается
+token bucket'ом (лишние запуски ждут в очереди), временные ошибки
+повторяются с экспоненциальной задержкой и случайным разбросом.
+
+Потраченная сумма за месяц хранится в JSON-файле через ConfigStore, поэтому
+учитывается между запусками и процессами. Резервы живут только в памяти
+текущего процесса.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config import (APIFY_USAGE_PATH, APIFY_MONTHLY_BUDGET_USD, APIFY_COST_PER_RESULT, APIFY_COST_PER_RUN,
+                    APIFY_RATE_PER_SECOND, APIFY_RATE_BURST, APIFY_MAX_RETRIES)
+from config_store import ConfigStore
+
+HARD_LIMIT_MESSAGE = "Monthly usage hard limit exceeded"
+QUOTA_EXCEEDED_MESSAGE = "Месячный бюджет Apify исчерпан"
+
+
+class QuotaExceededError(Exception):
+    """Прогон отклонен: он не укладывается в месячный бюджет Apify"""
+
+
+def estimate_run_cost(accounts_count, results_limit,
+                      cost_per_result=APIFY_COST_PER_RESULT, cost_per_run=APIFY_COST_PER_RUN):
+    """Оценка стоимости прогона в USD: фиксированная часть плюс оплата за каждый результат"""
+    return cost_per_run + accounts_count * int(results_limit) * cost_per_result
+
+
+def is_transient_error(error):
+    """Можно ли повторить вызов после ошибки: лимит частоты, ошибки сервера и сети"""
+    if HARD_LIMIT_MESSAGE in str(error):
+        return False
+    status_code = getattr(error, 'status_code', None)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def current_month():
+    return datetime.now(timezone.utc).strftime('%Y-%m')
+
+
+class TokenBucket:
+    """Ограничение частоты: rate токенов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate=APIFY_RATE_PER_SECOND, capacity=APIFY_RATE_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """Ждет, пока в корзине не появится нужное количество токенов"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class UsageBudget:
+    """Месячный бюджет Apify в USD с резервированием под запускаемые прогоны"""
+
+    def __init__(self, path=APIFY_USAGE_PATH, monthly_limit=APIFY_MONTHLY_BUDGET_USD):
+        self.store = ConfigStore(path)
+        self.monthly_limit = monthly_limit
+        self._reserved = 0.0
+        self._lock = threading.Lock()
+
+    def spent(self, month=None):
+        """Потрачено за месяц (по умолчанию текущий)"""
+        return float(self.store.get(month or current_month(), 0.0))
+
+    def remaining(self):
+        with self._lock:
+            return self.monthly_limit - self.spent() - self._reserved
+
+    def reserve(self, cost):
+        """Резервирует cost под прогон или выбрасывает QuotaExceededError"""
+        with self._lock:
+            available = self.monthly_limit - self.spent() - self._reserved
+            if cost > available:
+                raise QuotaExceededError(
+                    f"{QUOTA_EXCEEDED_MESSAGE}: нужно ~${cost:.2f}, доступно ${max(available, 0):.2f} "
+                    f"из ${self.monthly_limit:.2f}"
+                )
+            self._reserved += cost
+
+    def release(self, reserved):
+        with self._lock:
+            self._reserved = max(0.0, self._reserved - reserved)
+
+    def commit(self, reserved, actual):
+        """Снимает резерв и записывает фактическую стоимость прогона"""
+        month = current_month()
+        with self._lock:
+            self._reserved = max(0.0, self._reserved - reserved)
+            self.store.modify(lambda data: data.update({month: float(data.get(month, 0.0)) + actual}))
+
+    def mark_exhausted(self):
+        """Apify сообщил о жестком лимите: считаем бюджет месяца исчерпанным"""
+        month = current_month()
+        limit = self.monthly_limit
+        self.store.modify(lambda data: data.update({month: max(float(data.get(month, 0.0)), limit)}))
+
+
+class ApifyScheduler:
+    """Выполняет вызовы актора с учетом бюджета, частоты и повторов
+
+    Args:
+        bucket (TokenBucket, optional): ограничение частоты запусков
+        budget (UsageBudget, optional): месячный бюджет
+        max_retries (int): количество повторов при временных ошибках
+        backoff_base (float): базовая задержка между повторами, секунды
+        backoff_max (float): максимальная задержка между повторами, секунды
+    """
+
+    def __init__(self, bucket=None, budget=None, max_retries=APIFY_MAX_RETRIES, backoff_base=2.0, backoff_max=60.0):
+        self.bucket = bucket or TokenBucket()
+        self.budget = budget or UsageBudget()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def backoff(self, attempt):
+        """Задержка перед повтором: экспонента с полным случайным разбросом"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def run(self, func, estimated_cost):
+        """Вызывает func() — запуск актора — в рамках бюджета и лимита частоты
+
+        Фактическая стоимость берется из поля usageTotalUsd результата, если оно есть.
+
+        Raises:
+            QuotaExceededError: прогон не укладывается в бюджет или Apify сообщил о жестком лимите
+        """
+        self.budget.reserve(estimated_cost)
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                run = func()
+            except Exception as e:
+                if HARD_LIMIT_MESSAGE in str(e):
+                    self.budget.release(estimated_cost)
+                    self.budget.mark_exhausted()
+                    raise QuotaExceededError(f"{QUOTA_EXCEEDED_MESSAGE}: {e}") from e
+                if attempt < self.max_retries and is_transient_error(e):
+                    time.sleep(self.backoff(attempt))
+                    attempt += 1
+                    continue
+                self.budget.release(estimated_cost)
+                raise
+
+            actual = estimated_cost
+            if isinstance(run, dict) and run.get('usageTotalUsd') is not None:
+                actual = float(run['usageTotalUsd'])
+            self.budget.commit(estimated_cost, actual)
+            return run
@@ -0,0 +1,205 @@
+"""
+Потоковая загрузка датасетов Apify.
+
+Датасет читается страницами фиксированного размера, и каждая страница сразу
+уходит на диск, поэтому пиковое потребление памяти ограничено размером
+страницы, а не размером всего прогона. Страницы каждого прогона копятся в
+отдельном файле и попадают в результат только после успешного завершения
+прогона, так что частично собранные аккаунты не записываются в хранилище.
+"""
+
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config import DATASET_PAGE_SIZE
+
+
+def iter_dataset_pages(client, dataset_id, page_size=DATASET_PAGE_SIZE):
+    """Постранично читает элементы датасета Apify
+
+    Args:
+        client: клиент Apify (ApifyClient или совместимый фейк)
+        dataset_id (str): ID датасета
+        page_size (int): количество элементов на странице
+
+    Yields:
+        list: элементы очередной страницы
+    """
+    if page_size < 1:
+        raise ValueError(f"page_size должен быть >= 1, получено: {page_size}")
+
+    dataset = client.dataset(dataset_id)
+    offset = 0
+    while True:
+        items = dataset.list_items(offset=offset, limit=page_size).items
+        if items:
+            yield items
+        if len(items) < page_size:
+            break
+        offset += len(items)
+
+
+class GroupSpool:
+    """Страницы одного прогона актора во временном JSON Lines файле
+
+    Создается через StoreItemWriter.open_group(). commit() переносит страницы
+    в общий результат, abort() удаляет их и отмечает аккаунты группы как не
+    собранные.
+    """
+
+    def __init__(self, writer, accounts):
+        self.writer = writer
+        self.accounts = list(accounts)
+        self.rows = 0
+        fd, self.path = tempfile.mkstemp(suffix='.jsonl')
+        self._file = os.fdopen(fd, 'w', encoding='utf-8')
+
+    def write(self, items):
+        """Добавляет страницу элементов"""
+        for item in items:
+            self._file.write(json.dumps(item, ensure_ascii=False) + '\n')
+        self.rows += len(items)
+
+    def commit(self):
+        self.writer._commit_group(self)
+
+    def abort(self):
+        self.writer._abort_group(self)
+
+    def _discard(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class StoreItemWriter:
+    """Потокобезопасная запись элементов датасета в хранилище по частям
+
+    Элементы Apify могут иметь разный набор полей, поэтому страницы сначала
+    складываются во временный JSON Lines файл, а при закрытии переносятся в
+    хранилище блоками по chunk_size строк. Страницы прогона пишутся через
+    open_group() и попадают в общий файл только после commit() группы.
+
+    В режиме 'overwrite' reels аккаунтов, чьи прогоны не удались (abort()),
+    переносятся из прежнего хранилища, а не теряются.
+
+    Args:
+        store (PartitionedStore): хранилище сырых reels
+        mode (str): 'overwrite' — заменить датасет целиком,
+            'upsert' — объединить с существующими записями по ключу
+        chunk_size (int): размер блока при переносе в хранилище
+        on_chunk (callable, optional): вызывается для каждого записанного блока
+            новых элементов (DataFrame)
+    """
+
+    def __init__(self, store, mode='overwrite', chunk_size=DATASET_PAGE_SIZE, on_chunk=None):
+        if mode not in ('overwrite', 'upsert'):
+            raise ValueError(f"mode должен быть 'overwrite' или 'upsert', получено: {mode}")
+        self.store = store
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.on_chunk = on_chunk
+        self.rows = 0
+        self.failed_accounts = set()
+        self._groups = set()
+        self._lock = threading.Lock()
+
+        fd, self._spool_path = tempfile.mkstemp(suffix='.jsonl')
+        self._spool = os.fdopen(fd, 'w', encoding='utf-8')
+
+    def open_group(self, accounts=()):
+        """Спул для страниц прогона группы аккаунтов
+
+        Returns:
+            GroupSpool: страницы попадают в результат только после его commit()
+        """
+        group = GroupSpool(self, accounts)
+        with self._lock:
+            self._groups.add(group)
+        return group
+
+    def _commit_group(self, group):
+        group._file.close()
+        with self._lock:
+            with open(group.path, encoding='utf-8') as f:
+                shutil.copyfileobj(f, self._spool)
+            self.rows += group.rows
+            self._groups.discard(group)
+        group._discard()
+
+    def _abort_group(self, group):
+        with self._lock:
+            self.failed_accounts.update(group.accounts)
+            self._groups.discard(group)
+        group._discard()
+
+    def _discard_groups(self):
+        for group in list(self._groups):
+            group._discard()
+        self._groups.clear()
+
+    def _iter_spool_frames(self):
+        with open(self._spool_path, encoding='utf-8') as f:
+            chunk = []
+            for line in f:
+                chunk.append(json.loads(line))
+                if len(chunk) >= self.chunk_size:
+                    yield self._to_frame(chunk)
+                    chunk = []
+            if chunk:
+                yield self._to_frame(chunk)
+
+    def _to_frame(self, chunk):
+        frame = pd.DataFrame(chunk)
+        if self.on_chunk is not None:
+            self.on_chunk(frame)
+        return frame
+
+    def _kept_frames(self):
+        """Reels не собранных аккаунтов из прежнего хранилища"""
+        if not self.failed_accounts or not self.store.exists():
+            return
+        # Хранилище ведется по ownerUsername из Apify, он в нижнем регистре
+        accounts = self.failed_accounts | {account.lower() for account in self.failed_accounts}
+        yield from self.store.iter_batches(accounts=accounts, batch_size=self.chunk_size)
+
+    def close(self):
+        """Переносит накопленные элементы в хранилище и возвращает количество строк"""
+        with self._lock:
+            self._spool.close()
+            self._discard_groups()
+            try:
+                if self.mode == 'overwrite':
+                    self.store.overwrite(itertools.chain(self._iter_spool_frames(), self._kept_frames()))
+                else:
+                    for frame in self._iter_spool_frames():
+                        self.store.upsert(frame)
+            finally:
+                os.remove(self._spool_path)
+            return self.rows
+
+    def abort(self):
+        """Удаляет временные данные без записи результата"""
+        with self._lock:
+            self._spool.close()
+            self._discard_groups()
+            if os.path.exists(self._spool_path):
+                os.remove(self._spool_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
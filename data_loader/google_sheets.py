@@ -1,13 +1,11 @@
 from creds.accesses import client
-import pandas as pd
+from data_loader.storage import described_store
 
 if client is not None:
     try:
         # Load data for Google Sheets upload
-        import os
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-        data_path = os.path.join(base_dir, "raw_data", "described_data.csv")
-        df = pd.read_csv(data_path)
+        df = described_store().read()
+        df['timestamp'] = df['timestamp'].astype(str)
         
         # Create a summary or use the full data
         spreadsheet = client.open("Content Analysis")
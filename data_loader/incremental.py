@@ -0,0 +1,125 @@
+"""
+Инкрементальный сбор reels.
+
+Для каждого аккаунта хранится отметка последнего увиденного reel (самый
+свежий timestamp и его shortCode). При следующем запуске актор получает
+onlyPostsNewerThan для каждого аккаунта, а новые элементы объединяются с
+хранилищем по ключу id (переписываются только затронутые партиции), так что
+обновление большого списка аккаунтов стоит только новых reels.
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config import SCRAPE_STATE_PATH
+from config_store import ConfigStore
+from data_loader.dataset_stream import StoreItemWriter
+from data_loader.scraping_engine import scrape_accounts
+
+
+def _account_key(account):
+    # Apify возвращает ownerUsername в нижнем регистре, а в списке аккаунтов
+    # имя может быть записано как угодно
+    return str(account).strip().lower()
+
+
+def load_watermarks(path=SCRAPE_STATE_PATH):
+    """Загружает отметки аккаунтов: {account: {"timestamp": ..., "shortCode": ...}}"""
+    return {_account_key(account): dict(mark) for account, mark in ConfigStore(path).read().items()}
+
+
+def save_watermarks(marks, path=SCRAPE_STATE_PATH):
+    """Атомарно сохраняет отметки аккаунтов"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    ConfigStore(path).update({_account_key(account): mark for account, mark in marks.items()})
+
+
+def update_watermarks(marks, df, accounts=None):
+    """Сдвигает отметки аккаунтов по самым свежим reels из df
+
+    Args:
+        marks (dict): текущие отметки
+        df (pd.DataFrame): элементы с колонками ownerUsername, timestamp, shortCode
+        accounts (iterable, optional): обновлять отметки только этих аккаунтов
+
+    Returns:
+        dict: новые отметки
+    """
+    marks = dict(marks)
+    if df.empty:
+        return marks
+
+    frame = df[['ownerUsername', 'timestamp', 'shortCode']].copy()
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], utc=True, errors='coerce')
+    frame = frame.dropna(subset=['ownerUsername', 'timestamp'])
+    frame['ownerUsername'] = frame['ownerUsername'].map(_account_key)
+    if accounts is not None:
+        frame = frame[frame['ownerUsername'].isin([_account_key(account) for account in accounts])]
+
+    newest = frame.loc[frame.groupby('ownerUsername')['timestamp'].idxmax()]
+    for row in newest.itertuples(index=False):
+        current = marks.get(row.ownerUsername)
+        if current is not None and pd.Timestamp(current['timestamp']) >= row.timestamp:
+            continue
+        marks[row.ownerUsername] = {
+            'timestamp': row.timestamp.isoformat(),
+            'shortCode': None if pd.isna(row.shortCode) else row.shortCode,
+        }
+    return marks
+
+
+def incremental_input(marks):
+    """Возвращает функцию для scrape_accounts, добавляющую onlyPostsNewerThan в запуск группы
+
+    Для группы из нескольких аккаунтов берется самая старая отметка, а аккаунты
+    без отметки собираются полностью.
+    """
+    def input_for_group(group, run_input):
+        group_input = dict(run_input, username=list(group))
+        stamps = [marks.get(_account_key(account), {}).get('timestamp') for account in group]
+        if stamps and all(stamps):
+            group_input['onlyPostsNewerThan'] = min(stamps, key=pd.Timestamp)
+        return group_input
+    return input_for_group
+
+
+def scrape_incremental(client, run_input, store, state_path=SCRAPE_STATE_PATH, on_chunk=None, **engine_kwargs):
+    """Собирает только новые reels аккаунтов и дописывает их в хранилище
+
+    Args:
+        client: клиент Apify
+        run_input (dict): входные данные актора со списком аккаунтов в "username"
+        store (PartitionedStore): хранилище сырых reels
+        state_path (str): путь к файлу отметок аккаунтов
+        on_chunk (callable, optional): вызывается для каждого блока новых reels (DataFrame)
+        **engine_kwargs: дополнительные параметры scrape_accounts
+
+    Returns:
+        ScrapeReport: результат сбора по аккаунтам
+    """
+    # Без хранилища отметки бесполезны — собираем все заново
+    marks = load_watermarks(state_path) if store.exists() else {}
+    new_marks = {}
+
+    def track_watermarks(frame):
+        new_marks.update(update_watermarks(new_marks, frame))
+        if on_chunk is not None:
+            on_chunk(frame)
+
+    with StoreItemWriter(store, mode='upsert', on_chunk=track_watermarks) as writer:
+        report = scrape_accounts(client, run_input, sink=writer,
+                                 input_for_group=incremental_input(marks), **engine_kwargs)
+        if not report.succeeded:
+            raise RuntimeError("; ".join(f"{r.account}: {r.error}" for r in report.results.values()))
+
+    succeeded = {_account_key(account) for account in report.succeeded}
+    for account, mark in new_marks.items():
+        current = marks.get(account)
+        if account in succeeded and (current is None or pd.Timestamp(mark['timestamp']) > pd.Timestamp(current['timestamp'])):
+            marks[account] = mark
+    save_watermarks(marks, state_path)
+
+    return report
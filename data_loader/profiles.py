@@ -0,0 +1,116 @@
+"""
+Количество подписчиков аккаунтов для расчета engagement-метрик.
+
+Подписчики всех аккаунтов, которых нет в локальном кэше или чьи записи
+устарели, запрашиваются одним прогоном актора профилей Apify. Кэш хранится в
+JSON-файле через ConfigStore: запись на аккаунт с количеством подписчиков и
+временем получения; свежие записи (моложе TTL) отдаются без обращения к Apify.
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config import (INST_PROFILE_SCRAPER_ACTOR_ID, PROFILE_CACHE_PATH, PROFILE_CACHE_TTL_SECONDS,
+                    DATASET_PAGE_SIZE)
+from config_store import ConfigStore
+from data_loader.apify_scheduler import estimate_run_cost
+from data_loader.dataset_stream import iter_dataset_pages
+
+
+def _cache_key(account):
+    return str(account).strip().lower()
+
+
+class ProfileCache:
+    """Кэш количества подписчиков с TTL
+
+    Args:
+        path (str): путь к файлу кэша
+        ttl_seconds (float): время, в течение которого запись считается свежей
+    """
+
+    def __init__(self, path=PROFILE_CACHE_PATH, ttl_seconds=PROFILE_CACHE_TTL_SECONDS):
+        self.store = ConfigStore(path)
+        self.ttl_seconds = ttl_seconds
+
+    def followers(self, accounts=None, fresh_only=False):
+        """Подписчики из кэша: {аккаунт: количество}
+
+        Args:
+            accounts (list, optional): нужные аккаунты, по умолчанию все из кэша
+            fresh_only (bool): пропускать устаревшие записи
+        """
+        data = self.store.read()
+        now = time.time()
+        if accounts is None:
+            accounts = list(data)
+        result = {}
+        for account in accounts:
+            entry = data.get(_cache_key(account))
+            if entry is None or (fresh_only and now - entry['fetchedAt'] > self.ttl_seconds):
+                continue
+            result[account] = entry['followersCount']
+        return result
+
+    def put(self, counts):
+        """Сохраняет подписчиков {аккаунт: количество} одной записью в файл"""
+        now = time.time()
+        entries = {_cache_key(account): {'followersCount': int(count), 'fetchedAt': now}
+                   for account, count in counts.items()}
+        self.store.modify(lambda data: data.update(entries))
+
+
+def fetch_follower_counts(client, accounts, actor_id=INST_PROFILE_SCRAPER_ACTOR_ID, scheduler=None,
+                          page_size=DATASET_PAGE_SIZE):
+    """Запрашивает подписчиков всех аккаунтов одним прогоном актора профилей
+
+    Returns:
+        dict: {аккаунт: количество подписчиков} для найденных профилей
+    """
+    accounts = list(dict.fromkeys(accounts))
+    if not accounts:
+        return {}
+
+    def call_actor():
+        return client.actor(actor_id).call(run_input={"usernames": accounts})
+
+    run = scheduler.run(call_actor, estimate_run_cost(len(accounts), 1)) if scheduler is not None else call_actor()
+    if run is None:
+        raise RuntimeError("актор профилей не вернул информацию о запуске")
+    status = run.get('status')
+    if status is not None and status != 'SUCCEEDED':
+        raise RuntimeError(f"запуск {run.get('id')} завершился со статусом {status}")
+
+    lookup = {_cache_key(account): account for account in accounts}
+    counts = {}
+    for items in iter_dataset_pages(client, run['defaultDatasetId'], page_size):
+        for item in items:
+            account = lookup.get(_cache_key(item.get('username', '')))
+            if account is not None and item.get('followersCount') is not None:
+                counts[account] = int(item['followersCount'])
+    return counts
+
+
+def get_follower_counts(accounts, client=None, cache=None, scheduler=None, refresh=False):
+    """Подписчики аккаунтов: свежие из кэша, остальные одним запросом к Apify
+
+    Args:
+        accounts (list): аккаунты
+        client (optional): клиент Apify, нужен только если в кэше не все аккаунты
+        cache (ProfileCache, optional): кэш профилей
+        scheduler (ApifyScheduler, optional): бюджет, лимит частоты и повторы запуска
+        refresh (bool): запросить всех заново, игнорируя кэш
+
+    Returns:
+        dict: {аккаунт: количество подписчиков}; аккаунты без профиля отсутствуют
+    """
+    cache = cache or ProfileCache()
+    counts = {} if refresh else cache.followers(accounts, fresh_only=True)
+    missing = [account for account in accounts if account not in counts]
+    if missing:
+        fetched = fetch_follower_counts(client, missing, scheduler=scheduler)
+        cache.put(fetched)
+        counts.update(fetched)
+    return counts
@@ -0,0 +1,141 @@
+"""
+Локальный кэш результатов прогонов актора Apify.
+
+Ключ записи — SHA-256 от нормализованных входных данных прогона (аккаунты в
+нижнем регистре и отсортированы, ключи упорядочены), поэтому повторный запуск
+с теми же аккаунтами и resultsLimit в пределах TTL читается с диска и не
+тратит квоту Apify. Записи хранятся как JSON Lines в gzip, общий размер кэша
+ограничен: при превышении удаляются самые старые записи.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config import RUN_CACHE_DIR, RUN_CACHE_TTL_SECONDS, RUN_CACHE_MAX_BYTES, DATASET_PAGE_SIZE
+
+ENTRY_SUFFIX = '.jsonl.gz'
+
+
+def normalize_run_input(run_input):
+    """Приводит входные данные прогона к каноническому виду для ключа кэша"""
+    normalized = dict(run_input)
+    if "username" in normalized:
+        normalized["username"] = sorted({str(account).strip().lower() for account in normalized["username"]})
+    return normalized
+
+
+def run_input_key(run_input, actor_id=''):
+    """Хэш ID актора и нормализованных входных данных прогона"""
+    payload = json.dumps([actor_id, normalize_run_input(run_input)], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CacheEntryWriter:
+    """Запись одной записи кэша; видна читателям только после commit()"""
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        fd, self._tmp_path = tempfile.mkstemp(suffix='.tmp', dir=cache.root)
+        os.close(fd)
+        self._file = gzip.open(self._tmp_path, 'wt', encoding='utf-8')
+
+    def write(self, items):
+        for item in items:
+            self._file.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+    def commit(self):
+        self._file.close()
+        os.replace(self._tmp_path, self.cache.entry_path(self.key))
+        self.cache.evict()
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class RunCache:
+    """Кэш результатов прогонов с TTL и ограничением размера
+
+    Args:
+        root (str): директория кэша
+        ttl_seconds (float): время жизни записи
+        max_bytes (int): максимальный общий размер записей
+    """
+
+    def __init__(self, root=RUN_CACHE_DIR, ttl_seconds=RUN_CACHE_TTL_SECONDS, max_bytes=RUN_CACHE_MAX_BYTES):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def entry_path(self, key):
+        return os.path.join(self.root, key + ENTRY_SUFFIX)
+
+    def get(self, run_input, actor_id=''):
+        """Путь к свежей записи для прогона run_input актора actor_id или None"""
+        path = self.entry_path(run_input_key(run_input, actor_id))
+        try:
+            age = time.time() - os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        if age > self.ttl_seconds:
+            return None
+        return path
+
+    def iter_pages(self, path, page_size=DATASET_PAGE_SIZE):
+        """Постранично читает элементы записи кэша"""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            page = []
+            for line in f:
+                page.append(json.loads(line))
+                if len(page) >= page_size:
+                    yield page
+                    page = []
+            if page:
+                yield page
+
+    def writer(self, run_input, actor_id=''):
+        """Открывает запись кэша для результатов прогона run_input актора actor_id"""
+        return CacheEntryWriter(self, run_input_key(run_input, actor_id))
+
+    def evict(self):
+        """Удаляет просроченные записи и самые старые, пока кэш больше max_bytes"""
+        with self._lock:
+            now = time.time()
+            entries = []
+            for name in os.listdir(self.root):
+                if not name.endswith(ENTRY_SUFFIX):
+                    continue
+                path = os.path.join(self.root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if now - stat.st_mtime > self.ttl_seconds:
+                    os.remove(path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                os.remove(path)
+                total -= size
+
+    def clear(self):
+        """Полностью очищает кэш"""
+        with self._lock:
+            for name in os.listdir(self.root):
+                if name.endswith(ENTRY_SUFFIX):
+                    os.remove(os.path.join(self.root, name))
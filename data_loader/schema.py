@@ -0,0 +1,112 @@
+"""
+Компактное представление данных reels в памяти.
+
+compact() приводит колонки DataFrame к самым узким безопасным типам:
+строки с небольшим числом уникальных значений (аккаунты, mark*-категории)
+становятся category, остальной текст (url, подписи) — строками Arrow вместо
+Python-объектов, целочисленные счетчики — наименьшим подходящим целым,
+дробные метрики — float32, время публикации — datetime64 в UTC.
+memory_report() показывает занимаемую память по колонкам до и после.
+
+Типы применяются только к данным, которые читаются для анализа и отображения;
+хранилище и расчет статистик используют полную точность.
+"""
+
+import numpy as np
+import pandas as pd
+
+TIME_COLUMNS = ('timestamp',)
+CATEGORY_MAX_RATIO = 0.5         # Строки, где уникальных значений не больше этой доли, хранятся как category
+FLOAT_DTYPE = 'float32'          # Тип дробных метрик; None — оставить float64
+STRING_DTYPE = 'string[pyarrow]' # Тип уникального текста; None — оставить object
+
+
+def _downcast_integer(series):
+    """Наименьший целый тип, вмещающий все значения серии без пропусков"""
+    downcast = 'unsigned' if len(series) == 0 or series.min() >= 0 else 'integer'
+    return pd.to_numeric(series, downcast=downcast)
+
+
+def _compact_numeric(series, float_dtype):
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_extension_array_dtype(series):
+        # Nullable Int64/Float64 из Parquet: без пропусков переводим в numpy-типы
+        if series.isna().any():
+            return series
+        series = series.astype('int64' if pd.api.types.is_integer_dtype(series) else 'float64')
+    if pd.api.types.is_integer_dtype(series):
+        return _downcast_integer(series)
+
+    values = series.to_numpy()
+    finite = np.isfinite(values)
+    # Счетчики, сохраненные как float (после fillna), — на самом деле целые
+    if finite.all() and np.array_equal(values, np.round(values)) and np.abs(values).max(initial=0) < 2 ** 53:
+        return _downcast_integer(series.astype('int64'))
+    if float_dtype is not None and np.abs(values[finite]).max(initial=0) < np.finfo(float_dtype).max:
+        return series.astype(float_dtype)
+    return series
+
+
+def _compact_text(series, category_ratio, string_dtype):
+    if pd.api.types.infer_dtype(series, skipna=True) not in ('string', 'empty'):
+        return series  # Списки, словари и смешанные значения оставляем как есть
+    if len(series) and series.nunique(dropna=True) <= category_ratio * len(series):
+        return series.astype('category')
+    if string_dtype is not None and not isinstance(series.dtype, pd.StringDtype):
+        return series.astype(string_dtype)
+    return series
+
+
+def compact(df, category_ratio=CATEGORY_MAX_RATIO, float_dtype=FLOAT_DTYPE, time_columns=TIME_COLUMNS,
+            string_dtype=STRING_DTYPE):
+    """Возвращает копию df с компактными типами колонок
+
+    Args:
+        df (pd.DataFrame): исходные данные
+        category_ratio (float): максимальная доля уникальных значений для category
+        float_dtype (str, optional): тип дробных колонок, None — не менять
+        time_columns (tuple): колонки времени, приводятся к datetime64 UTC
+        string_dtype (str, optional): тип текстовых колонок, не ставших category
+
+    Returns:
+        pd.DataFrame: данные с теми же колонками и индексом
+    """
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        if column in time_columns or pd.api.types.is_datetime64_any_dtype(series):
+            series = pd.to_datetime(series, utc=True, errors='coerce')
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            pass
+        elif pd.api.types.is_numeric_dtype(series):
+            series = _compact_numeric(series, float_dtype)
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            series = _compact_text(series, category_ratio, string_dtype)
+        columns[column] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
+def memory_report(df, compacted=None):
+    """Память по колонкам до и после compact()
+
+    Args:
+        df (pd.DataFrame): исходные данные
+        compacted (pd.DataFrame, optional): результат compact(df), по умолчанию считается
+
+    Returns:
+        pd.DataFrame: байты и типы по колонкам до и после, строка TOTAL — итог
+    """
+    if compacted is None:
+        compacted = compact(df)
+    before = df.memory_usage(deep=True, index=False)
+    after = compacted.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'dtype_before': df.dtypes.astype(str),
+        'dtype_after': compacted.dtypes.astype(str),
+        'bytes_before': before,
+        'bytes_after': after,
+    })
+    report.loc['TOTAL'] = ['', '', before.sum(), after.sum()]
+    report['ratio'] = report['bytes_before'] / report['bytes_after'].where(report['bytes_after'] > 0)
+    return report
@@ -0,0 +1,224 @@
+"""
+Параллельный сбор reels через Apify.
+
+Список аккаунтов из run_input["username"] делится на небольшие группы, каждая
+группа запускается отдельным прогоном актора. Прогоны выполняются в пуле
+потоков с ограничением параллельности, результаты объединяются по мере
+завершения, а для каждого аккаунта фиксируется успех или ошибка. Если
+передан RunCache, свежие результаты прогонов с теми же входными данными
+читаются из кэша без запуска актора. Если передан ApifyScheduler, запуски
+актора проходят через проверку месячного бюджета, ограничение частоты и
+повторы при временных ошибках.
+
+Движку нужен только интерфейс клиента Apify:
+``client.actor(actor_id).call(run_input=...)`` и
+``client.dataset(dataset_id).list_items(offset=..., limit=...)``, поэтому
+вместо ApifyClient можно передать локальный фейковый клиент.
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config import INST_REAL_SCRAPER_ACTOR_ID, SCRAPER_MAX_CONCURRENCY, SCRAPER_ACCOUNTS_PER_RUN, DATASET_PAGE_SIZE
+from data_loader.apify_scheduler import QuotaExceededError, estimate_run_cost
+from data_loader.dataset_stream import iter_dataset_pages
+
+
+@dataclass
+class AccountResult:
+    """Итог сбора данных для одного аккаунта"""
+    account: str
+    ok: bool
+    items_count: int = 0
+    error: Optional[str] = None
+    run_id: Optional[str] = None
+    cached: bool = False
+    skipped: bool = False  # Прогон отклонен по бюджету, актор не запускался
+
+
+@dataclass
+class ScrapeReport:
+    """Объединенный результат всех прогонов актора"""
+    results: dict = field(default_factory=dict)
+    items: list = field(default_factory=list)
+
+    @property
+    def succeeded(self):
+        return [r.account for r in self.results.values() if r.ok]
+
+    @property
+    def failed(self):
+        return [r.account for r in self.results.values() if not r.ok and not r.skipped]
+
+    @property
+    def skipped(self):
+        return [r.account for r in self.results.values() if r.skipped]
+
+
+def split_accounts(accounts, accounts_per_run=SCRAPER_ACCOUNTS_PER_RUN):
+    """Делит список аккаунтов на группы для отдельных прогонов актора"""
+    if accounts_per_run < 1:
+        raise ValueError(f"accounts_per_run должен быть >= 1, получено: {accounts_per_run}")
+    # Убираем дубликаты, сохраняя порядок
+    unique_accounts = list(dict.fromkeys(accounts))
+    return [unique_accounts[i:i + accounts_per_run] for i in range(0, len(unique_accounts), accounts_per_run)]
+
+
+def _count_items_by_account(items, group, counts):
+    """Добавляет к counts количество элементов страницы по аккаунтам группы"""
+    if len(group) == 1:
+        counts[group[0]] += len(items)
+        return
+    lookup = {account.lower(): account for account in group}
+    for item in items:
+        owner = lookup.get(str(item.get('ownerUsername', '')).lower())
+        if owner is not None:
+            counts[owner] += 1
+
+
+def default_group_input(group, run_input):
+    """Входные данные актора для группы аккаунтов"""
+    return dict(run_input, username=list(group))
+
+
+def _run_group(client, actor_id, group_input, group, consume, page_size, cache=None, refresh=False, scheduler=None):
+    """Запускает актор для одной группы аккаунтов и постранично передает элементы в consume
+
+    Returns:
+        tuple: (run, counts) — информация о запуске и количество элементов по аккаунтам
+    """
+    counts = {account: 0 for account in group}
+
+    cached_path = cache.get(group_input, actor_id) if cache is not None and not refresh else None
+    if cached_path is not None:
+        for items in cache.iter_pages(cached_path, page_size):
+            consume(items)
+            _count_items_by_account(items, group, counts)
+        return {'id': None, 'cached': True}, counts
+
+    def call_actor():
+        return client.actor(actor_id).call(run_input=group_input)
+
+    if scheduler is not None:
+        # Стоимость оцениваем до запуска, чтобы не упереться в жесткий лимит Apify
+        cost = estimate_run_cost(len(group), group_input.get("resultsLimit", 1))
+        run = scheduler.run(call_actor, cost)
+    else:
+        run = call_actor()
+    if run is None:
+        raise RuntimeError("актор не вернул информацию о запуске")
+    status = run.get('status')
+    if status is not None and status != 'SUCCEEDED':
+        raise RuntimeError(f"запуск {run.get('id')} завершился со статусом {status}")
+
+    entry = cache.writer(group_input, actor_id) if cache is not None else None
+    try:
+        for items in iter_dataset_pages(client, run['defaultDatasetId'], page_size):
+            consume(items)
+            _count_items_by_account(items, group, counts)
+            if entry is not None:
+                entry.write(items)
+    except Exception:
+        if entry is not None:
+            entry.abort()
+        raise
+    if entry is not None:
+        entry.commit()
+    return run, counts
+
+
+def _scrape_group(client, actor_id, group_input, group, sink, buffer, page_size, cache=None, refresh=False,
+                  scheduler=None):
+    """Выполняет _run_group, складывая страницы в спул приемника или в buffer
+
+    Спул открывается только на время прогона, поэтому одновременно открыто
+    не больше спулов, чем выполняется прогонов.
+    """
+    if sink is None:
+        return _run_group(client, actor_id, group_input, group, buffer.extend, page_size, cache, refresh, scheduler)
+    spool = sink.open_group(group)
+    try:
+        result = _run_group(client, actor_id, group_input, group, spool.write, page_size, cache, refresh, scheduler)
+    except BaseException:
+        spool.abort()
+        raise
+    spool.commit()
+    return result
+
+
+def scrape_accounts(client, run_input, actor_id=INST_REAL_SCRAPER_ACTOR_ID,
+                    max_concurrency=SCRAPER_MAX_CONCURRENCY,
+                    accounts_per_run=SCRAPER_ACCOUNTS_PER_RUN, on_result=None,
+                    sink=None, page_size=DATASET_PAGE_SIZE, input_for_group=default_group_input,
+                    cache=None, refresh=False, scheduler=None):
+    """Собирает reels для всех аккаунтов из run_input параллельными прогонами актора
+
+    Args:
+        client: клиент Apify (ApifyClient или совместимый фейк)
+        run_input (dict): входные данные актора, список аккаунтов в ключе "username"
+        actor_id (str): ID актора Apify
+        max_concurrency (int): максимальное количество одновременных прогонов
+        accounts_per_run (int): количество аккаунтов в одном прогоне
+        on_result (callable, optional): вызывается как on_result(results)
+            после завершения каждой группы, results — список AccountResult
+        sink (optional): приемник страниц с методом open_group(accounts), например
+            StoreItemWriter. Страницы группы пишутся в ее спул и попадают в
+            приемник только после успешного завершения группы (commit()),
+            при ошибке спул отбрасывается (abort()). Если приемник не задан,
+            элементы успешных групп собираются в report.items
+        page_size (int): размер страницы при чтении датасетов
+        input_for_group (callable): строит входные данные прогона как
+            input_for_group(group, run_input)
+        cache (RunCache, optional): кэш результатов прогонов
+        refresh (bool): игнорировать свежие записи кэша и запускать актор
+        scheduler (ApifyScheduler, optional): бюджет, лимит частоты и повторы запусков
+
+    Returns:
+        ScrapeReport: статус каждого аккаунта и, если sink не задан,
+            элементы датасетов всех успешных прогонов
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"max_concurrency должен быть >= 1, получено: {max_concurrency}")
+
+    groups = split_accounts(run_input.get("username", []), accounts_per_run)
+    report = ScrapeReport()
+    if not groups:
+        return report
+
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(groups))) as executor:
+        futures = {}
+        for group in groups:
+            # Каждая группа копит элементы отдельно: в спуле приемника или в своем списке
+            buffer = []
+            group_input = input_for_group(group, run_input)
+            future = executor.submit(_scrape_group, client, actor_id, group_input, group, sink, buffer, page_size,
+                                     cache, refresh, scheduler)
+            futures[future] = (group, buffer)
+
+        for future in as_completed(futures):
+            group, buffer = futures[future]
+            try:
+                run, counts = future.result()
+            except Exception as e:
+                group_results = [
+                    AccountResult(account, ok=False, error=str(e), skipped=isinstance(e, QuotaExceededError))
+                    for account in group
+                ]
+            else:
+                group_results = [
+                    AccountResult(account, ok=True, items_count=counts[account], run_id=run.get('id'),
+                                  cached=run.get('cached', False))
+                    for account in group
+                ]
+                report.items.extend(buffer)
+
+            for result in group_results:
+                report.results[result.account] = result
+            if on_result is not None:
+                on_result(group_results)
+
+    return report
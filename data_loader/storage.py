@@ -0,0 +1,332 @@
+"""
+Колоночное хранилище датасетов в Parquet.
+
+Каждый датасет лежит в отдельной директории и разбит на партиции по аккаунту
+и месяцу публикации в формате hive:
+
+    raw_data/store/<dataset>/<accountColumn>=<account>/month=YYYY-MM/part-<uuid>.parquet
+
+В каждой партиции хранится один файл, поэтому дозапись (upsert) переписывает
+только затронутые партиции. Объединенная схема датасета хранится в файле
+_common_metadata, время его изменения служит версией датасета. При чтении
+поддерживаются выбор колонок и фильтры, которые отсекают лишние партиции и
+row group'ы.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config import STORE_DIR, INGEST_CHUNK_ROWS
+
+MONTH_COLUMN = 'month'
+SCHEMA_FILE = '_common_metadata'
+UNKNOWN_PARTITION = 'unknown'
+
+# Типы известных полей выгрузки Apify, остальные поля сохраняются строками
+# (вложенные структуры — в виде JSON)
+RAW_REELS_TYPES = {
+    'id': pa.string(),
+    'shortCode': pa.string(),
+    'ownerId': pa.string(),
+    'locationId': pa.string(),
+    'commentsCount': pa.int64(),
+    'likesCount': pa.int64(),
+    'videoViewCount': pa.int64(),
+    'videoPlayCount': pa.int64(),
+    'dimensionsHeight': pa.int64(),
+    'dimensionsWidth': pa.int64(),
+    'videoDuration': pa.float64(),
+    'timestamp': pa.timestamp('ns', tz='UTC'),
+    'isSponsored': pa.bool_(),
+    'isCommentsDisabled': pa.bool_(),
+}
+
+
+def _to_json_or_str(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _utc_timestamp(value):
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+
+
+def _coerce_column(series, arrow_type):
+    """Приводит колонку pandas к заданному типу Arrow"""
+    if pa.types.is_timestamp(arrow_type):
+        return pd.to_datetime(series, utc=True, errors='coerce')
+    if pa.types.is_integer(arrow_type):
+        return pd.to_numeric(series, errors='coerce').round().astype('Int64')
+    if pa.types.is_floating(arrow_type):
+        return pd.to_numeric(series, errors='coerce').astype('float64')
+    if pa.types.is_boolean(arrow_type):
+        if series.dtype == object:
+            series = series.map(lambda v: v if v is None or isinstance(v, bool) else str(v).lower() == 'true')
+        return series.astype('boolean')
+    return series.map(_to_json_or_str).astype(object)
+
+
+class PartitionedStore:
+    """Датасет в Parquet, разбитый на партиции по аккаунту и месяцу
+
+    Args:
+        root (str): директория датасета
+        account_column (str): колонка с именем аккаунта
+        time_column (str): колонка со временем публикации, по ней считается месяц
+        key (str): ключ записи для upsert
+        types (dict, optional): типы Arrow для известных колонок
+        default_type (pyarrow.DataType, optional): тип остальных колонок,
+            по умолчанию выводится из данных
+    """
+
+    def __init__(self, root, account_column, time_column='timestamp', key='id', types=None, default_type=None):
+        self.root = root
+        self.account_column = account_column
+        self.time_column = time_column
+        self.key = key
+        self.types = types or {}
+        self.default_type = default_type
+        self.partitioning = ds.partitioning(
+            pa.schema([(account_column, pa.string()), (MONTH_COLUMN, pa.string())]),
+            flavor='hive'
+        )
+
+    # --- Метаданные ---
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.root, SCHEMA_FILE))
+
+    def version(self):
+        """Версия датасета: (mtime_ns, size) файла схемы или None, если датасета нет"""
+        try:
+            stat = os.stat(os.path.join(self.root, SCHEMA_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def schema(self):
+        """Схема датасета вместе с колонками партиций"""
+        file_schema = pq.read_schema(os.path.join(self.root, SCHEMA_FILE))
+        return pa.unify_schemas([file_schema, self.partitioning.schema])
+
+    def accounts(self):
+        """Список аккаунтов по директориям партиций, без чтения данных"""
+        if not os.path.isdir(self.root):
+            return []
+        prefix = f'{self.account_column}='
+        return sorted(
+            unquote(name[len(prefix):]) for name in os.listdir(self.root)
+            if name.startswith(prefix)
+        )
+
+    # --- Чтение ---
+
+    def _scan(self, columns=None, accounts=None, start=None, end=None, filter=None):
+        """Датасет, колонки и фильтр для чтения с заданными условиями"""
+        if not self.exists():
+            raise FileNotFoundError(f"Датасет не найден: {self.root}")
+
+        schema = self.schema()
+        if columns is None:
+            columns = [name for name in schema.names if name != MONTH_COLUMN]
+
+        expression = filter
+        conditions = []
+        if accounts is not None:
+            conditions.append(ds.field(self.account_column).isin(list(accounts)))
+        if start is not None:
+            start = _utc_timestamp(start)
+            conditions.append(ds.field(MONTH_COLUMN) >= start.strftime('%Y-%m'))
+            conditions.append(ds.field(self.time_column) >= start)
+        if end is not None:
+            end = _utc_timestamp(end)
+            conditions.append(ds.field(MONTH_COLUMN) <= end.strftime('%Y-%m'))
+            conditions.append(ds.field(self.time_column) <= end)
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        dataset = ds.dataset(self.root, format='parquet', schema=schema, partitioning=self.partitioning)
+        return dataset, columns, expression
+
+    def read(self, columns=None, accounts=None, start=None, end=None, filter=None):
+        """Читает датасет в DataFrame
+
+        Args:
+            columns (list, optional): нужные колонки, по умолчанию все
+            accounts (list, optional): читать только эти аккаунты
+            start, end (optional): границы по времени публикации (включительно)
+            filter (pyarrow.dataset.Expression, optional): дополнительный фильтр
+
+        Returns:
+            pd.DataFrame: найденные записи
+        """
+        dataset, columns, expression = self._scan(columns, accounts, start, end, filter)
+        return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+    def iter_batches(self, columns=None, accounts=None, start=None, end=None, filter=None,
+                     batch_size=INGEST_CHUNK_ROWS):
+        """Читает датасет блоками не больше batch_size строк, условия как в read()
+
+        Yields:
+            pd.DataFrame: очередной блок записей
+        """
+        dataset, columns, expression = self._scan(columns, accounts, start, end, filter)
+        for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=batch_size):
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    # --- Запись ---
+
+    def _prepare(self, df):
+        """Приводит типы колонок и добавляет колонку месяца"""
+        df = df.copy()
+        for column in df.columns:
+            if column == self.account_column:
+                continue
+            arrow_type = self.types.get(column, self.default_type)
+            if arrow_type is not None:
+                df[column] = _coerce_column(df[column], arrow_type)
+            elif df[column].dtype == object:
+                df[column] = _coerce_column(df[column], pa.string())
+
+        if self.time_column in df.columns:
+            timestamps = pd.to_datetime(df[self.time_column], utc=True, errors='coerce')
+            df[MONTH_COLUMN] = timestamps.dt.strftime('%Y-%m').fillna(UNKNOWN_PARTITION)
+        else:
+            df[MONTH_COLUMN] = UNKNOWN_PARTITION
+        df[self.account_column] = df[self.account_column].astype(object).where(
+            df[self.account_column].notna(), UNKNOWN_PARTITION
+        ).astype(str)
+        return df
+
+    def _partition_dir(self, root, account, month):
+        return os.path.join(root, f'{self.account_column}={quote(account, safe="")}', f'{MONTH_COLUMN}={month}')
+
+    def _write_schema(self, root, schema):
+        """Объединяет схему датасета с новой и обновляет файл схемы (и версию)"""
+        schema_path = os.path.join(root, SCHEMA_FILE)
+        if os.path.exists(schema_path):
+            schema = pa.unify_schemas([pq.read_schema(schema_path), schema], promote_options='permissive')
+        pq.write_metadata(schema.remove_metadata(), schema_path)
+
+    def _upsert_into(self, root, df):
+        prepared = self._prepare(df)
+        written_schemas = []
+        for (account, month), part in prepared.groupby([self.account_column, MONTH_COLUMN], sort=False):
+            part = part.drop(columns=[self.account_column, MONTH_COLUMN])
+            table = pa.Table.from_pandas(part, preserve_index=False)
+
+            directory = self._partition_dir(root, account, month)
+            os.makedirs(directory, exist_ok=True)
+            old_files = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.parquet')]
+            if old_files:
+                tables = [pq.read_table(path) for path in old_files] + [table]
+                table = pa.concat_tables(tables, promote_options='permissive')
+                if self.key in table.column_names:
+                    merged = table.to_pandas().drop_duplicates(subset=self.key, keep='last')
+                    table = pa.Table.from_pandas(merged, schema=table.schema, preserve_index=False)
+
+            pq.write_table(table, os.path.join(directory, f'part-{uuid.uuid4().hex}.parquet'))
+            for path in old_files:
+                os.remove(path)
+            written_schemas.append(table.schema)
+
+        if written_schemas:
+            schema = pa.unify_schemas(written_schemas, promote_options='permissive')
+            self._write_schema(root, schema)
+        return len(prepared)
+
+    def upsert(self, df):
+        """Добавляет записи, заменяя существующие с тем же ключом
+
+        Переписываются только партиции (аккаунт, месяц), встречающиеся в df.
+
+        Returns:
+            int: количество записанных строк
+        """
+        if df.empty:
+            return 0
+        return self._upsert_into(self.root, df)
+
+    def overwrite(self, frames):
+        """Полностью заменяет датасет
+
+        Args:
+            frames: DataFrame или итератор DataFrame'ов (частей датасета)
+
+        Returns:
+            int: количество записанных строк
+        """
+        if isinstance(frames, pd.DataFrame):
+            frames = [frames]
+
+        staging = f'{self.root}.staging-{uuid.uuid4().hex}'
+        rows = 0
+        try:
+            for frame in frames:
+                if not frame.empty:
+                    rows += self._upsert_into(staging, frame)
+            if rows == 0:
+                # Пустой датасет: сохраняем только файл схемы
+                os.makedirs(staging, exist_ok=True)
+                self._write_schema(staging, pa.schema([]))
+            self.swap(staging)
+        finally:
+            if os.path.exists(staging):
+                shutil.rmtree(staging)
+        return rows
+
+    def swap(self, staging):
+        """Подменяет датасет подготовленной директорией"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.root)), exist_ok=True)
+        old = f'{self.root}.old-{uuid.uuid4().hex}'
+        if os.path.exists(self.root):
+            os.rename(self.root, old)
+        os.rename(staging, self.root)
+        if os.path.exists(old):
+            shutil.rmtree(old)
+
+
+def write_parquet_atomic(df, path):
+    """Записывает DataFrame в Parquet-файл атомарно
+
+    Файл пишется во временный файл в той же директории и подменяет path
+    через os.replace, поэтому читатели видят либо старый, либо новый файл.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix='.parquet', dir=directory)
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def reels_store(root=None):
+    """Хранилище сырых reels из Apify"""
+    return PartitionedStore(root or os.path.join(STORE_DIR, 'reels'), account_column='ownerUsername',
+                            types=RAW_REELS_TYPES, default_type=pa.string())
+
+
+def described_store(root=None):
+    """Хранилище обработанных reels с метриками"""
+    return PartitionedStore(root or os.path.join(STORE_DIR, 'described'), account_column='accountName')
@@ -0,0 +1,67 @@
+"""
+Per-account summary table for the dashboard overview.
+
+One row per account with the count, sum, mean, median, min and max of
+views, likes and comments and the account-level ratios of those totals.
+It is written next to the described store at processing time, so the
+dashboard shows an account's overview without aggregating its reels.
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config import ACCOUNT_SUMMARY_PATH
+from data_loader.storage import write_parquet_atomic
+from external_analysis.derived_metrics import SUMMARY_RATIOS, evaluate
+
+SUMMARY_METRICS = ['videoPlayCount', 'likesCount', 'commentsCount']
+SUMMARY_STATS = ['count', 'sum', 'mean', 'median', 'min', 'max']
+
+
+def summary_column(metric: str, stat: str) -> str:
+    """Name of a statistic column, e.g. likesCountMedian."""
+    return f'{metric}{stat.capitalize()}'
+
+
+def account_summary(df: pd.DataFrame, group_col: str = 'accountName') -> pd.DataFrame:
+    """Aggregate reels into one summary row per account in a single groupby pass.
+
+    The ratio columns are the SUMMARY_RATIOS of the derived metrics registry,
+    computed from the per-account sums.
+
+    Returns:
+        A frame indexed by account.
+    """
+    values = df[SUMMARY_METRICS].apply(pd.to_numeric, errors='coerce').astype('float64')
+    stats = values.groupby(df[group_col], sort=False, observed=True).agg(SUMMARY_STATS)
+    summary = pd.DataFrame({
+        summary_column(metric, stat): stats[(metric, stat)]
+        for metric in SUMMARY_METRICS for stat in SUMMARY_STATS
+    })
+    summary = evaluate(summary, [metric.name for metric in SUMMARY_RATIOS])
+    summary.index.name = group_col
+    return summary
+
+
+def save_summary(summary: pd.DataFrame, path: str = ACCOUNT_SUMMARY_PATH):
+    """Atomically write the summary table."""
+    write_parquet_atomic(summary.reset_index(), path)
+
+
+def load_summary(path: str = ACCOUNT_SUMMARY_PATH):
+    """Read the summary table; None if it has not been written yet."""
+    if not os.path.exists(path):
+        return None
+    summary = pd.read_parquet(path)
+    return summary.set_index(summary.columns[0])
+
+
+def update_summary(summary: pd.DataFrame, path: str = ACCOUNT_SUMMARY_PATH):
+    """Replace the rows of the accounts in summary, keeping the other accounts."""
+    existing = load_summary(path)
+    if existing is not None:
+        summary = pd.concat([existing[~existing.index.isin(summary.index)], summary])
+    save_summary(summary, path)
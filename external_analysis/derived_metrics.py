@@ -0,0 +1,137 @@
+"""
+Registry of derived metrics shared by the processing pipeline and the dashboard.
+
+Every metric is a vectorized NumPy expression over columns of the reels
+frame or other derived metrics. evaluate() computes the requested metrics
+in dependency order over whole columns at once. An optional guard marks
+rows where the expression is unreliable (they get the fallback value), and
+an optional cap bounds the result from above.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class DerivedMetric:
+    """A metric computed from other columns
+
+    expression and guard receive the dependency columns as float64 arrays,
+    in the order of depends.
+    """
+    name: str
+    depends: tuple
+    expression: Callable
+    guard: Optional[Callable] = None
+    fallback: float = np.nan
+    cap: Optional[float] = None
+
+
+# Per-reel engagement metrics computed by the pipeline (followersCount comes from the profile cache)
+PIPELINE_METRICS = [
+    DerivedMetric('engagementRate', ('likesCount', 'commentsCount', 'followersCount'),
+                  lambda likes, comments, followers: (likes + comments) / followers),
+    DerivedMetric('commentRate', ('commentsCount', 'followersCount'),
+                  lambda comments, followers: comments / followers),
+    DerivedMetric('likeRate', ('likesCount', 'followersCount'),
+                  lambda likes, followers: likes / followers),
+    DerivedMetric('likeCommentRate', ('likesCount', 'commentsCount'),
+                  lambda likes, comments: likes / np.where(comments > 0, comments, 1)),
+    DerivedMetric('viralityIndex', ('videoPlayCount', 'followersCount'),
+                  lambda views, followers: views / followers),
+    DerivedMetric('performanceScore', ('engagementRate', 'viralityIndex'),
+                  lambda engagement, virality: (engagement + virality) / 2),
+]
+
+# Per-reel chart series of the dashboard, in percent
+DASHBOARD_METRICS = [
+    DerivedMetric('likesPerFollowerPercent', ('likeRate',), lambda rate: rate * 100),
+    DerivedMetric('commentsPerFollowerPercent', ('commentRate',), lambda rate: rate * 100),
+    # Below 5 likes the ratio is unreliable; comments rarely exceed 50% of likes, so cap at 200%
+    DerivedMetric('commentsPerLikePercent', ('commentsCount', 'likesCount'),
+                  lambda comments, likes: comments / likes * 100,
+                  guard=lambda comments, likes: likes < 5, fallback=0.0, cap=200.0),
+]
+
+# Account-level ratios of totals, evaluated on account_summary rows; 0 when the denominator total is 0
+SUMMARY_RATIOS = [
+    DerivedMetric('likesPerView', ('likesCountSum', 'videoPlayCountSum'),
+                  lambda likes, views: likes / views,
+                  guard=lambda likes, views: ~(views > 0), fallback=0.0),
+    DerivedMetric('commentsPerView', ('commentsCountSum', 'videoPlayCountSum'),
+                  lambda comments, views: comments / views,
+                  guard=lambda comments, views: ~(views > 0), fallback=0.0),
+    DerivedMetric('commentsPerLike', ('commentsCountSum', 'likesCountSum'),
+                  lambda comments, likes: comments / likes,
+                  guard=lambda comments, likes: ~(likes > 0), fallback=0.0),
+]
+
+REGISTRY = {metric.name: metric for metric in PIPELINE_METRICS + DASHBOARD_METRICS + SUMMARY_RATIOS}
+
+
+def resolve_order(names, registry=REGISTRY, available=()):
+    """Names of the metrics to compute, each after the derived metrics it depends on.
+
+    Dependencies listed in available (e.g. columns already computed by the
+    pipeline) are used as they are instead of being recomputed.
+    """
+    order, visiting = [], set()
+
+    def visit(name, requested=False):
+        if name in order or name not in registry or (name in available and not requested):
+            return
+        if name in visiting:
+            raise ValueError(f"Circular dependency between derived metrics at {name!r}")
+        visiting.add(name)
+        for dependency in registry[name].depends:
+            visit(dependency)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in names:
+        if name not in registry:
+            raise KeyError(f"Unknown derived metric: {name!r}")
+        visit(name, requested=True)
+    return order
+
+
+def computable(names, columns, registry=REGISTRY):
+    """The metrics of names whose inputs are all in columns or computable from them."""
+    columns = set(columns)
+
+    def ready(name, seen=()):
+        if name in columns:
+            return True
+        if name not in registry or name in seen:
+            return False
+        return all(ready(dependency, seen + (name,)) for dependency in registry[name].depends)
+
+    return [name for name in names if all(ready(dependency, (name,)) for dependency in registry[name].depends)]
+
+
+def evaluate(df: pd.DataFrame, names=None, registry=REGISTRY) -> pd.DataFrame:
+    """Add the named derived metrics (and the derived metrics they need) as columns of df.
+
+    Args:
+        df: frame with the input columns of the metrics
+        names: metrics to compute, all of the registry by default; derived
+            metrics they depend on are computed only if df lacks them
+        registry: {name: DerivedMetric}
+
+    Returns:
+        df with the metric columns assigned.
+    """
+    for name in resolve_order(registry if names is None else names, registry, available=set(df.columns)):
+        metric = registry[name]
+        args = [df[column].to_numpy(dtype='float64', na_value=np.nan) for column in metric.depends]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = metric.expression(*args)
+            if metric.cap is not None:
+                values = np.minimum(values, metric.cap)
+            if metric.guard is not None:
+                values = np.where(metric.guard(*args), metric.fallback, values)
+        df[name] = values
+    return df
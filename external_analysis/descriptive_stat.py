@@ -3,10 +3,24 @@ import os
 import numpy as np
 import sys
 import json
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
 
 # Add parent directory to sys.path for config import
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from config import z_categorize
+from config import (ACCOUNT_SUMMARY_PATH, BASELINE_WINDOWS_DAYS, DEFAULT_FOLLOWERS, INGEST_CHUNK_ROWS,
+                    PROCESS_SHARD_ACCOUNTS, PROCESS_WORKERS, QUANTILE_SKETCH_PATH, RUNNING_STATS_PATH,
+                    ZSCORE_BASELINE, z_categorize_columns)
+from data_loader.profiles import ProfileCache
+from data_loader.schema import compact
+from data_loader.storage import reels_store, described_store
+from external_analysis.account_summary import account_summary, save_summary, update_summary
+from external_analysis.derived_metrics import PIPELINE_METRICS, evaluate
+from external_analysis.group_stats import grouped_zscores
+from external_analysis.quantile_sketch import build_sketches, load_sketches, merge_sketches, save_sketches
+from external_analysis.rolling_baselines import baseline_columns, trailing_baselines
+from external_analysis.running_stats import RunningStats, batch_state
 
 pd.set_option('display.float_format', '{:.3f}'.format)
 pd.set_option('display.max_rows', None)
@@ -15,62 +29,327 @@ pd.set_option('display.width', None)
 pd.set_option('display.expand_frame_repr', False)
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Legacy CSV export, imported into the reels store on first run
 DATA_PATH = os.path.join(BASE_DIR, "raw_data", "reels.csv")
-OUTPUT_PATH = os.path.join(BASE_DIR, "raw_data", "described_data.csv")
-
-# Lightweight z-score implementation (replace SciPy dependency)
-def simple_zscore(series: pd.Series) -> pd.Series:
-    """Return z-scores for a numeric pandas Series. NaNs are preserved."""
-    mean = series.mean(skipna=True)
-    std = series.std(ddof=0, skipna=True)
-    if std == 0 or np.isnan(std):
-        # Avoid division by zero – return zeros or NaNs accordingly
-        return pd.Series([0 if not np.isnan(v) else np.nan for v in series], index=series.index)
-    return (series - mean) / std
-
-def process_data():
+
+# Raw columns used by process_data and the dtypes they are parsed with;
+# everything else (comments, owner and music info, ...) is never read.
+# Counts are floats because the export leaves them empty when unknown.
+RAW_DTYPES = {
+    'id': str, 'ownerUsername': str, 'timestamp': str,
+    'videoPlayCount': 'float64', 'likesCount': 'float64', 'commentsCount': 'float64',
+    'caption': str, 'url': str, 'videoUrl': str, 'displayUrl': str, 'videoDuration': 'float64',
+}
+RAW_COLUMNS = list(RAW_DTYPES)
+
+def iter_raw_csv(path: str = DATA_PATH, chunksize: int = INGEST_CHUNK_ROWS):
+    """Read a raw Apify CSV export in bounded chunks of only the used, typed columns."""
+    with pd.read_csv(path, usecols=lambda column: column in RAW_DTYPES, dtype=RAW_DTYPES,
+                     chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield chunk.reindex(columns=RAW_COLUMNS)
+
+def _raw_store(store=None):
+    """The reels store, importing the legacy CSV export chunk by chunk on first use."""
+    store = store or reels_store()
+    if not store.exists() and os.path.exists(DATA_PATH):
+        store.overwrite(iter_raw_csv(DATA_PATH))
+    return store
+
+def iter_raw_reels(store=None, chunksize: int = INGEST_CHUNK_ROWS):
+    """Read the raw reels needed for processing from the reels store in batches."""
+    store = _raw_store(store)
+    available = set(store.schema().names)
+    for batch in store.iter_batches(columns=[c for c in RAW_COLUMNS if c in available], batch_size=chunksize):
+        yield batch.reindex(columns=RAW_COLUMNS)
+
+def load_raw_reels(store=None, accounts=None):
+    """Read the raw reels needed for processing from the reels store, optionally only some accounts."""
+    store = _raw_store(store)
+    available = set(store.schema().names)
+    df = store.read(columns=[c for c in RAW_COLUMNS if c in available], accounts=accounts)
+    return df.reindex(columns=RAW_COLUMNS)
+
+# Metrics that get a z-score and a mark* category
+METRICS = ['commentsCount', 'likesCount', 'videoPlayCount', 'videoDuration',
+           'engagementRate', 'commentRate', 'likeRate', 'performanceScore']
+
+# Metrics that get trailing 30/60/90/180-day baselines for the dashboard charts
+BASELINE_METRICS = ['likesCount', 'commentsCount', 'videoPlayCount']
+
+def mark_column(metric: str) -> str:
+    """Name of the mark* category column for a metric."""
+    return f'mark{metric.replace("Count", "").replace("Rate", "R")}'
+
+def cached_followers() -> dict:
+    """Follower counts of every account in the local profile cache, stale or not."""
+    return ProfileCache().followers()
+
+def resolve_followers(accounts: pd.Series, followers: dict = None) -> pd.Series:
+    """Follower count for every reel; unknown accounts fall back to DEFAULT_FOLLOWERS."""
+    if followers is None:
+        followers = cached_followers()
+    lookup = {str(account).lower(): count for account, count in followers.items()}
+    counts = pd.to_numeric(accounts.astype(str).str.lower().map(lookup), errors='coerce')
+    return counts.where(counts > 0).fillna(DEFAULT_FOLLOWERS).astype('float64')
+
+def add_rates(processed_df: pd.DataFrame, followers: dict = None) -> pd.DataFrame:
+    """Compute the per-follower engagement rates (PIPELINE_METRICS) from the counts."""
+    processed_df['followersCount'] = resolve_followers(processed_df['accountName'], followers)
+    return evaluate(processed_df, [metric.name for metric in PIPELINE_METRICS])
+
+def derive_metrics(df: pd.DataFrame, followers: dict = None) -> pd.DataFrame:
+    """Derive the engagement metrics of raw reels (without z-scores).
+
+    followers maps account to follower count; the profile cache is used if omitted.
+    """
+    # Extract required fields
+    processed_df = pd.DataFrame()
+    processed_df['id'] = df['id']
+    processed_df['accountName'] = df['ownerUsername']
+    processed_df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+    processed_df['videoPlayCount'] = pd.to_numeric(df['videoPlayCount'], errors='coerce').fillna(0)
+    processed_df['likesCount'] = pd.to_numeric(df['likesCount'], errors='coerce').fillna(0)
+    processed_df['commentsCount'] = pd.to_numeric(df['commentsCount'], errors='coerce').fillna(0)
+    processed_df['caption'] = df['caption']
+    processed_df['url'] = df['url']
+    processed_df['videoUrl'] = df['videoUrl']
+    # Poster image of the reel; missing in reels stored before it was collected
+    processed_df['displayUrl'] = df['displayUrl'] if 'displayUrl' in df.columns else None
+    processed_df['videoDuration'] = pd.to_numeric(df['videoDuration'], errors='coerce').fillna(0)
+    
+    # Calculate engagement metrics
+    return add_rates(processed_df, followers)
+
+def add_scores(processed_df: pd.DataFrame, z_scores: pd.DataFrame) -> pd.DataFrame:
+    """Attach z-scores and their mark* categories, binning all of them in one pass."""
+    marks = z_categorize_columns(z_scores, z_scores.columns)
+    for metric in METRICS:
+        z_col = f'z{metric}'
+        processed_df[z_col] = z_scores[z_col]
+        processed_df[mark_column(metric)] = marks[z_col]
+    
+    return processed_df
+
+def add_baselines(processed_df: pd.DataFrame) -> pd.DataFrame:
+    """Attach the trailing per-account mean/std of BASELINE_METRICS for every window."""
+    baselines = trailing_baselines(processed_df, BASELINE_METRICS)
+    for column in baselines.columns:
+        processed_df[column] = baselines[column]
+    return processed_df
+
+def score_metrics(processed_df: pd.DataFrame, baseline: str = None) -> pd.DataFrame:
+    """Add z-scores, mark* categories and trailing baselines to derived metrics."""
+    # Calculate z-scores against the configured baseline
+    z_scores = grouped_zscores(processed_df, METRICS, baseline=baseline or ZSCORE_BASELINE)
+    return add_baselines(add_scores(processed_df, z_scores))
+
+def shard_of(account, shards: int) -> int:
+    """Shard of an account: crc32 of its name, stable across processes and runs."""
+    return zlib.crc32(str(account).encode('utf-8')) % shards
+
+def _process_shard(raw_df, accounts, followers, baseline):
+    """Derive and score the reels of one shard of accounts (runs in a worker process).
+
+    Reads the shard's accounts from the reels store if raw_df is None. With
+    the global baseline z-scores need every shard and are left to the caller.
+
+    Returns:
+        (processed reels, running-stats state, quantile sketches) of the shard
+    """
+    if raw_df is None:
+        raw_df = load_raw_reels(accounts=accounts)
+    derived_df = derive_metrics(raw_df, followers)
+    processed_df = score_metrics(derived_df, baseline) if baseline == 'account' else add_baselines(derived_df)
+    return processed_df, batch_state(processed_df, METRICS), build_sketches(processed_df, METRICS)
+
+def _process_sharded(raw_df, followers, baseline, workers, shard_accounts):
+    """Process accounts sharded by shard_of() across a process pool.
+
+    Every per-account computation only sees its own account's reels, so the
+    result is identical to the serial one; rows, statistics and sketches are
+    put back in the order serial processing produces them.
+
+    Returns:
+        (processed reels, running-stats state, quantile sketches)
+    """
+    if raw_df is None:
+        accounts = _raw_store().accounts()
+        account_column = None
+    else:
+        accounts = list(pd.unique(raw_df['ownerUsername']))
+        account_column = raw_df['ownerUsername']
+    shards = max(1, -(-len(accounts) // shard_accounts))
+    shard_ids = np.array([shard_of(account, shards) for account in accounts], dtype=np.int64)
+
+    tasks, positions = [], []
+    for shard in np.unique(shard_ids):
+        shard_accounts_list = [account for account, i in zip(accounts, shard_ids) if i == shard]
+        if account_column is None:
+            tasks.append((None, shard_accounts_list))
+        else:
+            rows = np.flatnonzero(account_column.isin(shard_accounts_list).to_numpy())
+            positions.append(rows)
+            tasks.append((raw_df.iloc[rows], None))
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        results = list(executor.map(_process_shard, *zip(*tasks), [followers] * len(tasks), [baseline] * len(tasks)))
+    frames, states, sketch_parts = zip(*results)
+
+    processed_df = pd.concat(frames)
+    if account_column is None:
+        # The store is scanned partition by partition, in path order
+        rank = {account: i for i, account in enumerate(sorted(accounts, key=lambda a: quote(str(a), safe='')))}
+        order = np.argsort(processed_df['accountName'].map(rank).to_numpy(), kind='stable')
+        processed_df = processed_df.iloc[order].reset_index(drop=True)
+    else:
+        processed_df = processed_df.iloc[np.argsort(np.concatenate(positions), kind='stable')]
+
+    if baseline != 'account':
+        scored_df = add_scores(processed_df, grouped_zscores(processed_df, METRICS, baseline=baseline))
+        baseline_cols = [c for w in BASELINE_WINDOWS_DAYS for m in BASELINE_METRICS for c in baseline_columns(m, w)]
+        processed_df = scored_df[[c for c in scored_df.columns if c not in baseline_cols] + baseline_cols]
+
+    account_order = pd.unique(processed_df['accountName'])
+    state = pd.concat(states)
+    state = state.reindex(pd.MultiIndex.from_product([account_order, METRICS], names=state.index.names))
+    state = state.dropna(subset=['count'])
+    sketches = {}
+    for part in sketch_parts:
+        sketches.update(part)
+    sketches = {(account, metric): sketches[(account, metric)]
+                for metric in METRICS for account in account_order if (account, metric) in sketches}
+    return processed_df, state, sketches
+
+def process_data(raw_df: pd.DataFrame = None, store=None, stats_path: str = RUNNING_STATS_PATH,
+                 sketch_path: str = QUANTILE_SKETCH_PATH, followers: dict = None, baseline: str = None,
+                 workers: int = PROCESS_WORKERS, shard_accounts: int = PROCESS_SHARD_ACCOUNTS,
+                 summary_path: str = ACCOUNT_SUMMARY_PATH) -> pd.DataFrame:
+    """Process raw reels and save the result to the described store.
+
+    Also rebuilds the running statistics used by process_incremental(), and
+    the per-account quantile sketches and summary table used by the dashboard.
+
+    Args:
+        raw_df: raw reels with RAW_COLUMNS; streamed from the reels store in
+            batches if omitted, so the raw columns are never held in full
+        store: target store, described_store() by default
+        stats_path: where the running statistics are saved
+        sketch_path: where the quantile sketches are saved
+        followers: follower count per account, the profile cache by default
+        baseline: z-score baseline, ZSCORE_BASELINE by default
+        workers: worker processes; with more than one, accounts are sharded
+            by shard_of() and processed in parallel with identical results
+        shard_accounts: average number of accounts per shard
+        summary_path: where the per-account summary table is saved
+
+    Returns:
+        The processed DataFrame with compact dtypes; the store and the
+        statistics keep full precision.
+    """
     try:
-        # Read the CSV file
-        df = pd.read_csv(DATA_PATH)
-        
-        # Extract required fields
-        processed_df = pd.DataFrame()
-        processed_df['accountName'] = df['ownerUsername']
-        processed_df['timestamp'] = pd.to_datetime(df['timestamp'])
-        processed_df['videoPlayCount'] = pd.to_numeric(df['videoPlayCount'], errors='coerce').fillna(0)
-        processed_df['likesCount'] = pd.to_numeric(df['likesCount'], errors='coerce').fillna(0)
-        processed_df['commentsCount'] = pd.to_numeric(df['commentsCount'], errors='coerce').fillna(0)
-        processed_df['caption'] = df['caption']
-        processed_df['url'] = df['url']
-        processed_df['videoDuration'] = pd.to_numeric(df['videoDuration'], errors='coerce').fillna(0)
-        
-        # Calculate engagement metrics
-        total_followers = 10000  # Default value for demo
-        processed_df['engagementRate'] = (processed_df['likesCount'] + processed_df['commentsCount']) / total_followers
-        processed_df['commentRate'] = processed_df['commentsCount'] / total_followers
-        processed_df['likeRate'] = processed_df['likesCount'] / total_followers
-        processed_df['likeCommentRate'] = processed_df['likesCount'] / np.where(processed_df['commentsCount'] > 0, processed_df['commentsCount'], 1)
-        processed_df['viralityIndex'] = processed_df['videoPlayCount'] / total_followers
-        processed_df['performanceScore'] = (processed_df['engagementRate'] + processed_df['viralityIndex']) / 2
-        
-        # Calculate z-scores
-        metrics = ['commentsCount', 'likesCount', 'videoPlayCount', 'videoDuration', 
-                  'engagementRate', 'commentRate', 'likeRate', 'performanceScore']
-        
-        for metric in metrics:
-            z_col = f'z{metric}'
-            processed_df[z_col] = simple_zscore(processed_df[metric])
-            mark_col = f'mark{metric.replace("Count", "").replace("Rate", "R")}'
-            processed_df[mark_col] = processed_df[z_col].apply(z_categorize)
+        if followers is None:
+            followers = cached_followers()
+        baseline = baseline or ZSCORE_BASELINE
+        has_reels = _raw_store().exists() if raw_df is None else not raw_df.empty
+        if workers > 1 and has_reels:
+            processed_df, state, sketches = _process_sharded(raw_df, followers, baseline, workers, shard_accounts)
+            stats = RunningStats(state, stats_path)
+        else:
+            if raw_df is None:
+                # Derive metrics batch by batch; only the derived frame is kept
+                chunks = [derive_metrics(chunk, followers) for chunk in iter_raw_reels()]
+                derived_df = (pd.concat(chunks, ignore_index=True) if chunks
+                              else derive_metrics(pd.DataFrame(columns=RAW_COLUMNS), followers))
+            else:
+                derived_df = derive_metrics(raw_df, followers)
+
+            processed_df = score_metrics(derived_df, baseline)
+            stats = RunningStats.from_frame(processed_df, METRICS, stats_path)
+            sketches = build_sketches(processed_df, METRICS)
         
         # Save processed data
-        processed_df.to_csv(OUTPUT_PATH, index=False)
-        print(f"Data processed successfully and saved to {OUTPUT_PATH}")
+        store = store or described_store()
+        store.overwrite(processed_df)
+        stats.save()
+        save_sketches(sketches, sketch_path)
+        save_summary(account_summary(processed_df), summary_path)
+        print(f"Data processed successfully and saved to {store.root}")
+        return compact(processed_df)
         
     except Exception as e:
         print(f"Error processing data: {str(e)}")
         raise
 
+def process_incremental(new_raw_df: pd.DataFrame, store=None, stats_path: str = RUNNING_STATS_PATH,
+                        sketch_path: str = QUANTILE_SKETCH_PATH, baseline: str = None,
+                        followers: dict = None, summary_path: str = ACCOUNT_SUMMARY_PATH) -> pd.DataFrame:
+    """Fold new or updated raw reels into the described store without a full recompute.
+
+    The running statistics are updated in O(new rows): replaced reels are
+    retracted and new ones added. Only reels whose baseline moved are
+    rescored — those of the touched accounts, or all reels with the global
+    baseline — which gives the same z-scores and marks as process_data().
+    Stored reels of accounts whose follower count changed get new rates.
+    Falls back to process_data() if nothing has been processed yet.
+
+    Returns:
+        The rescored reels with compact dtypes.
+    """
+    store = store or described_store()
+    if not store.exists():
+        return process_data(store=store, stats_path=stats_path, sketch_path=sketch_path, followers=followers,
+                            baseline=baseline, summary_path=summary_path)
+
+    baseline = baseline or ZSCORE_BASELINE
+    if followers is None:
+        followers = cached_followers()
+    new_df = derive_metrics(new_raw_df, followers).drop_duplicates('id', keep='last')
+    if new_df.empty:
+        return compact(new_df)
+
+    stats = RunningStats.load(stats_path)
+    if stats is None:
+        stats = RunningStats.from_frame(store.read(columns=['accountName'] + METRICS), METRICS, stats_path)
+
+    # Stored reels whose z-scores depend on the changed baselines
+    accounts = None if baseline == 'global' else list(new_df['accountName'].dropna().unique())
+    existing = store.read(accounts=accounts)
+    replaced = existing['id'].isin(new_df['id'])
+    stats.remove(existing[replaced], METRICS)
+    stats.add(new_df, METRICS)
+
+    # Rates of stored reels were computed with the follower count of their run;
+    # accounts missing from followers keep theirs rather than falling back to the default
+    stored_followers = existing.get('followersCount', pd.Series(np.nan, index=existing.index))
+    known = existing['accountName'].astype(str).str.lower().isin({str(account).lower() for account in followers})
+    stale = ~replaced & known & (stored_followers != resolve_followers(existing['accountName'], followers))
+    refreshed = add_rates(existing[stale].copy(), followers)
+    stats.remove(existing[stale], METRICS)
+    stats.add(refreshed, METRICS)
+
+    affected = pd.concat([existing[~replaced & ~stale], refreshed, new_df], ignore_index=True)
+    affected = add_scores(affected, stats.zscores(affected, METRICS, baseline=baseline))
+    affected = add_baselines(affected)
+    store.upsert(affected)
+    stats.save()
+
+    # Sketches can't retract values: accounts that only gained reels have them
+    # folded in, those with replaced or refreshed reels are rebuilt
+    sketches = load_sketches(sketch_path)
+    if sketches:
+        rebuilt = set(existing.loc[replaced | stale, 'accountName'])
+        folded = new_df[~new_df['accountName'].isin(rebuilt)]
+        for key, sketch in build_sketches(folded, METRICS).items():
+            sketches[key] = merge_sketches([sketches.get(key), sketch])
+        sketches.update(build_sketches(affected[affected['accountName'].isin(rebuilt)], METRICS))
+    else:
+        sketches = build_sketches(affected, METRICS)
+    save_sketches(sketches, sketch_path)
+    # Summaries of the touched accounts are rebuilt from all of their reels
+    update_summary(account_summary(affected), summary_path)
+    print(f"Incrementally processed {len(new_df)} reels, rescored {len(affected)}")
+    return compact(affected)
+
 if __name__ == "__main__":
     process_data()
-
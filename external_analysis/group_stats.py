@@ -0,0 +1,63 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config import ZSCORE_BASELINE
+
+BASELINES = ('account', 'global')
+
+
+def zscore_from_stats(values: pd.DataFrame, mean: pd.DataFrame, std: pd.DataFrame) -> pd.DataFrame:
+    """(values - mean) / std; zero where the variance is degenerate, NaN where the value is missing."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (values - mean) / std
+    degenerate = ~(std > 0)
+    return z.mask(degenerate & values.notna(), 0.0)
+
+
+def group_stats(df: pd.DataFrame, metrics, group_col: str = 'accountName') -> pd.DataFrame:
+    """Per-group count, mean and population std of each metric in one groupby pass.
+
+    Returns a frame indexed by group with (statistic, metric) columns.
+    """
+    grouped = df.groupby(group_col, sort=False, dropna=False)[list(metrics)]
+    return pd.concat({
+        'count': grouped.count(),
+        'mean': grouped.mean(),
+        'std': grouped.std(ddof=0),
+    }, axis=1)
+
+
+def grouped_zscores(df: pd.DataFrame, metrics, group_col: str = 'accountName',
+                    baseline: str = ZSCORE_BASELINE) -> pd.DataFrame:
+    """Z-scores of all metrics against the chosen baseline.
+
+    Args:
+        df: frame with the metric columns and group_col
+        metrics: metric columns to score
+        group_col: column identifying the account
+        baseline: 'account' scores each reel against its own account,
+            'global' against all reels in df
+
+    Returns:
+        A frame with a z<metric> column per metric, aligned with df.
+    """
+    if baseline not in BASELINES:
+        raise ValueError(f"baseline must be one of {BASELINES}, got: {baseline!r}")
+    metrics = list(metrics)
+    values = df[metrics].apply(pd.to_numeric, errors='coerce').astype('float64')
+
+    if baseline == 'account':
+        grouped = values.groupby(df[group_col], sort=False, dropna=False)
+        mean = grouped.transform('mean')
+        std = grouped.transform('std', ddof=0)
+    else:
+        mean = values.mean()
+        std = values.std(ddof=0)
+
+    z = zscore_from_stats(values, mean, std)
+    z.columns = [f'z{metric}' for metric in metrics]
+    return z
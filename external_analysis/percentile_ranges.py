@@ -0,0 +1,104 @@
+"""
+Count and sum of a metric in percentile ranges, in one pass.
+
+The values are sorted once; the position of every range edge is found with
+searchsorted, so counts are differences of positions and sums differences
+of a prefix sum. Ranges are half-open, [lower, upper), except the top one
+which also includes the maximum, so every value falls into exactly one
+range and the counts add up to the number of values.
+
+Used by the dashboard's advanced metrics panel and by
+export_percentile_ranges(), which writes the table of every account.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_loader.storage import described_store
+
+EXPORT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "raw_data", "percentile_ranges.csv"))
+# Range edges in percent, from the top range down: 100-99, 99-90, ..., 5-0
+PERCENTILE_EDGES = [100, 99, 90, 75, 50, 25, 10, 5, 0]
+
+
+def range_stats(values, edges):
+    """Count and sum of values in each range between consecutive ascending edges.
+
+    Ranges are [edges[i], edges[i + 1]), the last one also includes
+    edges[-1]. NaN values are ignored.
+
+    Returns:
+        tuple: (counts, sums) arrays with len(edges) - 1 elements
+    """
+    values = np.asarray(values, dtype='float64')
+    values = np.sort(values[~np.isnan(values)])
+    edges = np.asarray(edges, dtype='float64')
+    bounds = np.searchsorted(values, edges, side='left')
+    bounds[-1] = np.searchsorted(values, edges[-1], side='right')
+    prefix = np.r_[0.0, np.cumsum(values)]
+    return np.diff(bounds), np.diff(prefix[bounds])
+
+
+def percentile_range_table(values, percentile_edges=PERCENTILE_EDGES, quantiles=None) -> pd.DataFrame:
+    """Count and sum of values in each percentile range, from the top range down.
+
+    Args:
+        values: metric values (NaN ignored)
+        percentile_edges: descending edges in percent, 100 and 0 mean max and min
+        quantiles: optional {percent: value} for the inner edges, e.g. from
+            a quantile sketch; computed from values if omitted
+
+    Returns:
+        A frame indexed by range label ("100-99", ...) with the lower and
+        upper edge values, count, sum and their shares of the totals in percent.
+    """
+    values = pd.Series(values, dtype='float64').dropna()
+    edges = sorted(percentile_edges)
+    if values.empty:
+        edge_values = np.full(len(edges), np.nan)
+    else:
+        inner = [p for p in edges if 0 < p < 100]
+        if quantiles is None:
+            quantiles = dict(zip(inner, values.quantile([p / 100 for p in inner]).to_numpy()))
+        lookup = {0: values.min(), 100: values.max(), **quantiles}
+        edge_values = np.array([lookup[p] for p in edges], dtype='float64')
+
+    counts, sums = range_stats(values.to_numpy(), edge_values)
+    total_count, total_sum = counts.sum(), sums.sum()
+    table = pd.DataFrame({
+        'lower': edge_values[:-1],
+        'upper': edge_values[1:],
+        'count': counts,
+        'sum': sums,
+        'countShare': counts / total_count * 100 if total_count > 0 else np.zeros(len(counts)),
+        'sumShare': sums / total_sum * 100 if total_sum > 0 else np.zeros(len(sums)),
+    }, index=[f'{upper}-{lower}' for lower, upper in zip(edges[:-1], edges[1:])])
+    return table.iloc[::-1]
+
+
+def export_percentile_ranges(metrics, path: str = EXPORT_PATH, store=None,
+                             percentile_edges=PERCENTILE_EDGES) -> pd.DataFrame:
+    """Write the percentile range table of every account and metric to a CSV file.
+
+    Returns:
+        The exported table with accountName, metric and range columns.
+    """
+    store = store or described_store()
+    df = store.read(columns=['accountName'] + list(metrics))
+    tables = []
+    for account, reels in df.groupby('accountName', sort=True):
+        for metric in metrics:
+            table = percentile_range_table(reels[metric], percentile_edges)
+            tables.append(table.rename_axis('range').reset_index().assign(accountName=account, metric=metric))
+    columns = ['accountName', 'metric', 'range', 'lower', 'upper', 'count', 'sum', 'countShare', 'sumShare']
+    result = pd.concat(tables, ignore_index=True)[columns] if tables else pd.DataFrame(columns=columns)
+    result.to_csv(path, index=False)
+    return result
+
+
+if __name__ == "__main__":
+    export_percentile_ranges(['videoPlayCount', 'likesCount', 'commentsCount'])
@@ -0,0 +1,92 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config import BASELINE_WINDOWS_DAYS
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def baseline_columns(metric: str, window: int):
+    """Names of the trailing mean and std columns of a metric for a window in days."""
+    return f'{metric}Mean{window}d', f'{metric}Std{window}d'
+
+
+def trailing_baselines(df: pd.DataFrame, metrics, windows=BASELINE_WINDOWS_DAYS,
+                       group_col: str = 'accountName', time_col: str = 'timestamp') -> pd.DataFrame:
+    """Trailing per-account mean and std of each metric over the last N days before every reel.
+
+    A reel's window covers its account's reels published in (t - N days, t):
+    the reel itself and reels with the same timestamp are left out, so a
+    spike does not raise its own baseline, and an account's first reel gets
+    NaN. All windows come from one sort by (account, time): window sums are
+    differences of cumulative sums whose bounds are found with searchsorted.
+    Values are centered on the account mean first so the sums of squares
+    keep their precision.
+
+    Returns:
+        A frame aligned with df with <metric>Mean<N>d and <metric>Std<N>d columns.
+    """
+    metrics = list(metrics)
+    columns = [name for window in windows for metric in metrics for name in baseline_columns(metric, window)]
+    n = len(df)
+    if n == 0:
+        return pd.DataFrame(index=df.index, columns=columns, dtype='float64')
+
+    codes, _ = pd.factorize(df[group_col], use_na_sentinel=False)
+    times = pd.to_datetime(df[time_col], utc=True)
+    has_time = times.notna().to_numpy()
+    seconds = np.where(has_time, times.to_numpy(dtype='datetime64[s]', na_value=np.datetime64(0, 's')).astype('int64'), 0)
+    # Reels without a time get key 0, the start of their account's range, so the
+    # keys stay sorted; they are excluded from every window and get NaN baselines
+    seconds = np.where(has_time, seconds - seconds[has_time].min(), 0) if has_time.any() else seconds
+
+    # Single (account, time) ordering; the key keeps accounts apart so one
+    # searchsorted call finds window bounds for every account at once
+    order = np.lexsort((seconds, codes))
+    span = int(seconds.max()) + max(windows) * SECONDS_PER_DAY + 1
+    key = codes[order].astype('int64') * span + seconds[order]
+    # Windows end before the first reel with the same (account, time)
+    right = np.searchsorted(key, key, side='left')
+
+    values = df[metrics].apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64')[order]
+    valid = ~np.isnan(values) & has_time[order, None]
+    values = np.where(valid, values, np.nan)
+    account_mean = pd.DataFrame(values).groupby(codes[order]).transform('mean').to_numpy()
+    centered = np.where(valid, values - account_mean, 0.0)
+
+    # Sums restart at every account, so an account's baselines do not depend
+    # on the other accounts in df (sharded processing gives identical results)
+    k = len(metrics)
+    sorted_codes = codes[order]
+    starts = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+    group_start = np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+    sums = pd.DataFrame(np.hstack([centered, centered ** 2])).groupby(sorted_codes, sort=False).cumsum().to_numpy()
+    count = np.vstack([np.zeros((1, k)), np.cumsum(valid, axis=0)])
+
+    result = {}
+    for window in windows:
+        left = np.searchsorted(key, key - window * SECONDS_PER_DAY, side='right')
+        window_count = count[right] - count[left]
+        before = np.where((left > group_start)[:, None], sums[np.maximum(left - 1, 0)], 0.0)
+        window_sums = np.where((right > left)[:, None], sums[np.maximum(right - 1, 0)] - before, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = window_sums[:, :k] / window_count
+            variance = np.maximum(window_sums[:, k:] / window_count - mean ** 2, 0.0)
+        # A lone reel has no spread; don't report the rounding noise of the sums.
+        # Empty windows keep NaN (0 / 0)
+        variance[window_count == 1] = 0.0
+        mean = np.where(valid, mean + account_mean, np.nan)
+        std = np.where(valid, np.sqrt(variance), np.nan)
+        for i, metric in enumerate(metrics):
+            mean_col, std_col = baseline_columns(metric, window)
+            result[mean_col] = mean[:, i]
+            result[std_col] = std[:, i]
+
+    # Back to the caller's row order
+    inverse = np.empty(n, dtype=np.int64)
+    inverse[order] = np.arange(n)
+    return pd.DataFrame({name: result[name][inverse] for name in columns}, index=df.index)
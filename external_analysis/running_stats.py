@@ -0,0 +1,138 @@
+"""
+Running (Welford) statistics per account and metric.
+
+The state keeps count, mean and M2 (sum of squared deviations) for every
+(accountName, metric) pair. New reels are folded in and replaced reels are
+retracted in O(changed rows) with Chan's parallel update, so partial states
+computed independently merge into exactly the state of the combined data.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config import RUNNING_STATS_PATH, ZSCORE_BASELINE
+from data_loader.storage import write_parquet_atomic
+from external_analysis.group_stats import BASELINES, group_stats, zscore_from_stats
+
+STATE_COLUMNS = ['count', 'mean', 'm2']
+STATE_INDEX = ['accountName', 'metric']
+# Retraction leaves rounding noise in M2; a std this small relative to the mean counts as zero variance
+RELATIVE_STD_EPSILON = 1e-9
+
+
+def empty_state() -> pd.DataFrame:
+    index = pd.MultiIndex.from_arrays([[], []], names=STATE_INDEX)
+    return pd.DataFrame({column: pd.Series(dtype='float64') for column in STATE_COLUMNS}, index=index)
+
+
+def batch_state(df: pd.DataFrame, metrics, group_col: str = 'accountName') -> pd.DataFrame:
+    """State of a batch of reels: count, mean and M2 per (account, metric)."""
+    if df.empty:
+        return empty_state()
+    stats = group_stats(df, metrics, group_col)
+    state = pd.DataFrame({
+        'count': stats['count'].stack(future_stack=True),
+        'mean': stats['mean'].stack(future_stack=True),
+        'm2': (stats['std'] ** 2 * stats['count']).stack(future_stack=True),
+    }).astype('float64')
+    state.index.names = STATE_INDEX
+    return state[state['count'] > 0]
+
+
+def merge_states(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """Combine two states as if their reels had been counted together (Chan et al.)."""
+    a, b = a.align(b, join='outer', fill_value=0.0)
+    n = a['count'] + b['count']
+    delta = b['mean'] - a['mean']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = b['count'] / n
+    merged = pd.DataFrame({
+        'count': n,
+        'mean': a['mean'] + delta * weight,
+        'm2': a['m2'] + b['m2'] + delta ** 2 * a['count'] * weight,
+    })
+    return merged[merged['count'] > 0]
+
+
+def retract_state(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """Remove the reels summarized by b from a; b must be a subset of a's reels."""
+    b = b.reindex(a.index, fill_value=0.0)
+    n = a['count'] - b['count']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (a['count'] * a['mean'] - b['count'] * b['mean']) / n
+        m2 = a['m2'] - b['m2'] - (b['mean'] - mean) ** 2 * n * b['count'] / a['count']
+    retracted = pd.DataFrame({'count': n, 'mean': mean, 'm2': m2.clip(lower=0.0)})
+    return retracted[retracted['count'] > 0]
+
+
+class RunningStats:
+    """Persisted per-account running statistics.
+
+    Args:
+        state: initial state, empty by default
+        path: Parquet file the state is saved to
+    """
+
+    def __init__(self, state: pd.DataFrame = None, path: str = RUNNING_STATS_PATH):
+        self.state = state if state is not None else empty_state()
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str = RUNNING_STATS_PATH):
+        """Load the saved state; returns None if nothing has been saved yet."""
+        if not os.path.exists(path):
+            return None
+        state = pd.read_parquet(path).set_index(STATE_INDEX)
+        return cls(state[STATE_COLUMNS].astype('float64'), path)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, metrics, path: str = RUNNING_STATS_PATH):
+        return cls(batch_state(df, metrics), path)
+
+    def save(self):
+        """Atomically write the state next to the processed data."""
+        write_parquet_atomic(self.state.reset_index(), self.path)
+
+    def add(self, df: pd.DataFrame, metrics):
+        """Fold new reels into the state."""
+        self.state = merge_states(self.state, batch_state(df, metrics))
+
+    def remove(self, df: pd.DataFrame, metrics):
+        """Retract reels that were previously added (e.g. before they are replaced)."""
+        if not df.empty:
+            self.state = retract_state(self.state, batch_state(df, metrics))
+
+    def global_state(self) -> pd.DataFrame:
+        """Collapse the per-account state into one state per metric."""
+        state = self.state
+        grouped = state.groupby(level='metric')
+        count = grouped['count'].sum()
+        mean = (state['count'] * state['mean']).groupby(level='metric').sum() / count
+        deviation = state['mean'] - mean.reindex(state.index.get_level_values('metric')).to_numpy()
+        m2 = grouped['m2'].sum() + (state['count'] * deviation ** 2).groupby(level='metric').sum()
+        return pd.DataFrame({'count': count, 'mean': mean, 'm2': m2})
+
+    def zscores(self, df: pd.DataFrame, metrics, group_col: str = 'accountName',
+                baseline: str = ZSCORE_BASELINE) -> pd.DataFrame:
+        """Z-scores of df's reels against the running baseline, like grouped_zscores()."""
+        if baseline not in BASELINES:
+            raise ValueError(f"baseline must be one of {BASELINES}, got: {baseline!r}")
+        metrics = list(metrics)
+        values = df[metrics].apply(pd.to_numeric, errors='coerce').astype('float64')
+
+        if baseline == 'account':
+            wide = self.state.unstack('metric').reindex(df[group_col].to_numpy())
+            count, mean, m2 = (wide[column].reindex(columns=metrics) for column in STATE_COLUMNS)
+            mean, std = mean.set_axis(df.index), np.sqrt(m2 / count).set_axis(df.index)
+        else:
+            state = self.global_state().reindex(metrics)
+            mean, std = state['mean'], np.sqrt(state['m2'] / state['count'])
+
+        std = std.mask(std <= RELATIVE_STD_EPSILON * np.abs(mean), 0.0)
+        z = zscore_from_stats(values, mean, std)
+        z.columns = [f'z{metric}' for metric in metrics]
+        return z
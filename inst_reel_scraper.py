@@ -1,26 +1,90 @@
-import pandas as pd
 import os
-from apify_client import ApifyClient
-from config import INST_REAL_SCRAPER_ACTOR_ID, reels_input_data
-
-# Получаем API ключ из переменных окружения
-api_key = os.getenv('APIFY_API')
-if not api_key:
-    raise ValueError("❌ API ключ Apify не найден. Убедитесь, что переменная окружения APIFY_API установлена.")
-
-# Создаем директорию для данных, если её нет
-os.makedirs('raw_data', exist_ok=True)
-
-try:
-    client = ApifyClient(api_key)
-    
-    # Запускаем сбор данных
-    run = client.actor(INST_REAL_SCRAPER_ACTOR_ID).call(run_input=reels_input_data)
-    dataset_items = client.dataset(run['defaultDatasetId']).list_items().items
-    
-    # Сохраняем результаты
-    df = pd.DataFrame(dataset_items)
-    df.to_csv('raw_data/reels.csv', index=False)
-    
-except Exception as e:
-    raise Exception(f"❌ Ошибка при сборе данных: {str(e)}")
+import sys
+from config import reels_input_data
+from data_loader.apify_scheduler import ApifyScheduler
+from data_loader.dataset_stream import StoreItemWriter
+from data_loader.incremental import scrape_incremental
+from data_loader.run_cache import RunCache
+from data_loader.scraping_engine import scrape_accounts
+from data_loader.storage import reels_store
+
+
+def get_client():
+    """Создает клиент Apify по ключу из переменной окружения APIFY_API"""
+    from apify_client import ApifyClient
+
+    # Получаем API ключ из переменных окружения
+    api_key = os.getenv('APIFY_API')
+    if not api_key:
+        raise ValueError("❌ API ключ Apify не найден. Убедитесь, что переменная окружения APIFY_API установлена.")
+    return ApifyClient(api_key)
+
+
+def report_progress(results):
+    """Выводит статус аккаунтов по мере завершения прогонов"""
+    for result in results:
+        if result.ok:
+            source = " (из кэша)" if result.cached else ""
+            print(f"✅ {result.account}: получено {result.items_count} reels{source}")
+        elif result.skipped:
+            print(f"⏸️ {result.account}: {result.error}")
+        else:
+            print(f"❌ {result.account}: {result.error}")
+
+
+def scrape_reels(run_input=None, client=None, store=None, incremental=False, on_result=None, on_chunk=None,
+                 refresh=False, scheduler=None):
+    """Собирает reels аккаунтов и сохраняет их в хранилище
+
+    Args:
+        run_input (dict, optional): входные данные актора, по умолчанию reels_input_data
+        client (optional): клиент Apify, по умолчанию создается get_client()
+        store (PartitionedStore, optional): хранилище сырых reels
+        incremental (bool): собирать только новые reels и объединять с хранилищем
+        on_result (callable, optional): вызывается со статусами аккаунтов по мере завершения прогонов
+        on_chunk (callable, optional): вызывается для каждого блока, записанного
+            в хранилище (DataFrame); в инкрементальном режиме — только новые reels
+        refresh (bool): не использовать кэш прогонов и запускать актор заново
+        scheduler (ApifyScheduler, optional): планировщик запусков, по умолчанию
+            с месячным бюджетом и лимитами из config
+
+    Returns:
+        ScrapeReport: результат сбора по аккаунтам
+    """
+    run_input = dict(run_input if run_input is not None else reels_input_data)
+    client = client or get_client()
+    store = store or reels_store()
+    cache = RunCache()
+    scheduler = scheduler or ApifyScheduler()
+
+    try:
+        if incremental:
+            # Собираем только reels новее последних отметок и объединяем с хранилищем
+            report = scrape_incremental(client, run_input, store, on_result=on_result,
+                                        on_chunk=on_chunk, cache=cache, refresh=refresh,
+                                        scheduler=scheduler)
+        else:
+            # Запускаем сбор данных параллельно по аккаунтам, страницы датасетов
+            # сразу пишутся на диск и заменяют хранилище при выходе из блока
+            with StoreItemWriter(store, mode='overwrite', on_chunk=on_chunk) as writer:
+                report = scrape_accounts(client, run_input, on_result=on_result, sink=writer,
+                                         cache=cache, refresh=refresh, scheduler=scheduler)
+                if not report.succeeded:
+                    raise RuntimeError("; ".join(f"{r.account}: {r.error}" for r in report.results.values()))
+    except Exception as e:
+        raise Exception(f"❌ Ошибка при сборе данных: {str(e)}")
+
+    return report
+
+
+def main():
+    report = scrape_reels(incremental='--incremental' in sys.argv, refresh='--refresh' in sys.argv,
+                          on_result=report_progress)
+    if report.failed:
+        print(f"⚠️ Не удалось собрать данные для аккаунтов: {', '.join(report.failed)}")
+    if report.skipped:
+        print(f"⏸️ Пропущены из-за бюджета Apify: {', '.join(report.skipped)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ def main():
     print("1. Run dashboard: streamlit run streamlit_dashboard.py")
     print("2. Run transcriptor: python external_analysis/gpt_transcriptor.py")
     print("3. Process data: python external_analysis/descriptive_stat.py")
+    print("4. Scrape and process: python pipeline.py [--accounts a,b] [--limit N] [--incremental]")
     print()
     print("For more information, see README.md")
 
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+DataSentry - In-process data pipeline
+
+Runs the stages scrape → enrich → process inside one interpreter and passes
+the raw reels and follower counts between them in memory. Both the dashboard
+and the command line use run_pipeline().
+"""
+
+import argparse
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pandas as pd
+
+from config import reels_input_data
+from data_loader.apify_scheduler import ApifyScheduler
+from data_loader.profiles import ProfileCache, get_follower_counts
+from external_analysis.descriptive_stat import RAW_COLUMNS, process_data, process_incremental
+from inst_reel_scraper import get_client, report_progress, scrape_reels
+
+
+@dataclass
+class StageResult:
+    """Outcome of a single pipeline stage"""
+    name: str
+    ok: bool
+    seconds: float
+    rows: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class PipelineResult:
+    """Outcome of a pipeline run: per-stage results and the processed data"""
+    stages: list = field(default_factory=list)
+    scrape_report: object = None
+    data: Optional[pd.DataFrame] = None
+
+    @property
+    def ok(self):
+        return bool(self.stages) and all(stage.ok for stage in self.stages)
+
+    @property
+    def error(self):
+        return next((stage.error for stage in self.stages if not stage.ok), None)
+
+    @property
+    def total_seconds(self):
+        return sum(stage.seconds for stage in self.stages)
+
+
+def _run_stage(result, name, func, on_stage=None):
+    """Run one stage, record its timing and outcome; returns (ok, value)"""
+    started = time.perf_counter()
+    try:
+        value, rows = func()
+    except Exception as e:
+        stage = StageResult(name, ok=False, seconds=time.perf_counter() - started, error=str(e))
+        value = None
+    else:
+        stage = StageResult(name, ok=True, seconds=time.perf_counter() - started, rows=rows)
+    result.stages.append(stage)
+    if on_stage is not None:
+        on_stage(stage)
+    return stage.ok, value
+
+
+def run_pipeline(accounts=None, results_limit=None, incremental=False, scrape=True,
+                 refresh=False, client=None, on_stage=None, on_result=None):
+    """Scrape reels for the given accounts and process them in-process.
+
+    Args:
+        accounts (list, optional): accounts to scrape, reels_input_data["username"] by default
+        results_limit (int, optional): reels per account, reels_input_data["resultsLimit"] by default
+        incremental (bool): only fetch reels newer than the stored watermarks
+        scrape (bool): set to False to only reprocess the stored raw reels
+        refresh (bool): bypass the actor run and profile caches and scrape again
+        client (optional): Apify client, created from APIFY_API by default
+        on_stage (callable, optional): called with each StageResult as it finishes
+        on_result (callable, optional): called with per-account scrape results
+
+    Returns:
+        PipelineResult: per-stage results, the scrape report and the processed data
+            (only the rescored reels in incremental mode).
+    """
+    run_input = dict(reels_input_data)
+    if accounts is not None:
+        run_input["username"] = list(accounts)
+    if results_limit is not None:
+        run_input["resultsLimit"] = int(results_limit)
+
+    result = PipelineResult()
+    raw_df = None
+    followers = None
+    # One budget and rate limit for every actor run of this pipeline
+    scheduler = ApifyScheduler()
+
+    if scrape:
+        chunks = []
+
+        def collect(frame):
+            chunks.append(frame.reindex(columns=RAW_COLUMNS))
+
+        def scrape_stage():
+            report = scrape_reels(run_input, client=client, incremental=incremental,
+                                  on_result=on_result, on_chunk=collect, refresh=refresh, scheduler=scheduler)
+            result.scrape_report = report
+            rows = sum(r.items_count for r in report.results.values())
+            if not incremental and (report.failed or report.skipped):
+                # The reels store keeps the stored reels of failed and skipped accounts,
+                # which never pass through on_chunk; process from the store instead
+                return None, rows
+            frame = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=RAW_COLUMNS)
+            return frame, rows
+
+        ok, raw_df = _run_stage(result, 'scrape', scrape_stage, on_stage)
+        if not ok:
+            return result
+
+        def enrich_stage():
+            accounts = run_input["username"]
+            try:
+                counts = get_follower_counts(accounts, client=client or get_client(), refresh=refresh,
+                                             scheduler=scheduler)
+            except Exception as e:
+                # Not fatal: rates fall back to cached or default follower counts
+                print(f"⚠️ Could not fetch follower counts, using cached values: {e}")
+                counts = ProfileCache().followers(accounts)
+            return counts, len(counts)
+
+        ok, followers = _run_stage(result, 'enrich', enrich_stage, on_stage)
+
+    def process_stage():
+        if scrape and incremental:
+            # Only the new reels are folded into the running statistics
+            processed = process_incremental(raw_df, followers=followers)
+            return processed, len(processed)
+        processed = process_data(raw_df, followers=followers)
+        return processed, len(processed)
+
+    ok, result.data = _run_stage(result, 'process', process_stage, on_stage)
+    return result
+
+
+def print_stage(stage):
+    status = "✅" if stage.ok else "❌"
+    details = f"{stage.rows} rows" if stage.ok else stage.error
+    print(f"{status} {stage.name}: {stage.seconds:.2f}s ({details})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the DataSentry scrape → enrich → process pipeline")
+    parser.add_argument("--accounts", help="comma-separated accounts, defaults to config")
+    parser.add_argument("--limit", type=int, help="reels per account, defaults to config")
+    parser.add_argument("--incremental", action="store_true", help="only fetch new reels")
+    parser.add_argument("--skip-scrape", action="store_true", help="reprocess stored raw reels only")
+    parser.add_argument("--refresh", action="store_true", help="ignore cached actor runs and profiles")
+    args = parser.parse_args()
+
+    accounts = [a.strip() for a in args.accounts.split(",") if a.strip()] if args.accounts else None
+    result = run_pipeline(accounts, args.limit, incremental=args.incremental, scrape=not args.skip_scrape,
+                          refresh=args.refresh, on_stage=print_stage, on_result=report_progress)
+    print(f"Total: {result.total_seconds:.2f}s")
+    if not result.ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
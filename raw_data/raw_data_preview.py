@@ -1,5 +1,11 @@
+import os
+import sys
+
 import pandas as pd
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_loader.storage import described_store
+
 pd.set_option('display.max_rows', None)
 pd.set_option('display.max_columns', None)
 pd.set_option('display.width', None)
@@ -7,10 +13,9 @@ pd.set_option('display.width', None)
 pd.set_option('display.expand_frame_repr', True)
 
 
-df = pd.read_csv('described_data.csv')
-df = df[
-    [
-        'inputUrl',
+df = described_store().read(
+    columns=[
+        'accountName',
         'url',
         'videoUrl',
         'timestamp',
@@ -24,5 +29,5 @@ df = df[
         'viralityIndex',
         'performanceScore'
     ]
-]
+)
 print(df)
\ No newline at end of file
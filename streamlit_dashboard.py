@@ -1,10 +1,13 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 import numpy as np
-import os
-import subprocess
-from config import stdev_hot_treshold, stdev_very_successful_treshold, reels_input_data, update_accounts
+from config import (stdev_hot_treshold, stdev_very_successful_treshold, reels_input_data, update_accounts,
+                    Z_CATEGORIES, BASELINE_WINDOWS_DAYS, VIDEO_PAGE_SIZE)
+import dashboard_charts
+import dashboard_data
+from data_loader.apify_scheduler import QUOTA_EXCEEDED_MESSAGE, UsageBudget
+from external_analysis.percentile_ranges import percentile_range_table
+from external_analysis.rolling_baselines import baseline_columns
+from pipeline import run_pipeline
 
 st.write("### 📊 Настройка анализа")
 
@@ -25,6 +28,17 @@ posts_limit = st.slider(
     help="Выберите количество последних постов, которые будут проанализированы для каждого аккаунта"
 )
 
+# Повторный запуск с теми же настройками берет результаты из кэша
+force_refresh = st.checkbox(
+    "🔄 Обновить данные принудительно",
+    value=False,
+    help="Игнорировать кэш прогонов Apify и заново собрать данные (расходует квоту)"
+)
+
+# Остаток месячного бюджета Apify
+budget = UsageBudget()
+st.caption(f"💳 Бюджет Apify: потрачено ${budget.spent():.2f} из ${budget.monthly_limit:.2f} в этом месяце")
+
 # Кнопка для применения настроек
 if st.button("🚀 Применить и запустить анализ", help="Обновить настройки и запустить сбор данных"):
     if accounts_input:
@@ -42,32 +56,58 @@ if st.button("🚀 Применить и запустить анализ", help=
         loading_placeholder = st.empty()
         loading_placeholder.info(f"⏳ Запускаем анализ {len(accounts_list)} аккаунтов (по {posts_limit} последних постов)...")
         
-        try:
-            # Запускаем скраппер
-            result = subprocess.run(["python", "inst_reel_scraper.py"], 
-                                 check=True, 
-                                 capture_output=True, 
-                                 text=True)
-            
-            # Запускаем обработку данных
-            loading_placeholder.info("⏳ Обрабатываем полученные данные...")
-            stat_result = subprocess.run(["python", "external_analysis/descriptive_stat.py"],
-                                      check=True,
-                                      capture_output=True,
-                                      text=True)
-            
-            # Очищаем сообщение о загрузке
-            loading_placeholder.empty()
+        # Запускаем сбор и обработку данных в текущем процессе
+        stage_titles = {'scrape': "Сбор данных", 'enrich': "Загрузка подписчиков", 'process': "Обработка данных"}
+        
+        def show_stage(stage):
+            if stage.ok and stage.name == 'scrape':
+                loading_placeholder.info("⏳ Загружаем количество подписчиков...")
+            elif stage.ok and stage.name == 'enrich':
+                loading_placeholder.info("⏳ Обрабатываем полученные данные...")
+        
+        # Статус каждого аккаунта по мере завершения его прогона
+        account_status = st.container()
+        
+        def show_accounts(results):
+            for account_result in results:
+                if account_result.ok:
+                    source = " (из кэша)" if account_result.cached else ""
+                    account_status.write(f"✅ {account_result.account}: получено {account_result.items_count} reels{source}")
+                elif account_result.skipped:
+                    account_status.write(f"⏸️ {account_result.account}: пропущен — {account_result.error}")
+                else:
+                    account_status.write(f"❌ {account_result.account}: {account_result.error}")
+        
+        result = run_pipeline(accounts_list, posts_limit, refresh=force_refresh, on_stage=show_stage,
+                              on_result=show_accounts)
+        dashboard_data.clear_cache()
+        
+        # Очищаем сообщение о загрузке
+        loading_placeholder.empty()
+        
+        report = result.scrape_report
+        failed_accounts = report.failed if report is not None else []
+        skipped_accounts = report.skipped if report is not None else []
+        
+        if result.ok and not failed_accounts and not skipped_accounts:
             st.success("✅ Анализ успешно завершен!")
             
             # Перезагружаем страницу для отображения новых данных
             st.rerun()
+        elif result.ok:
+            # Данные остальных аккаунтов обновлены; статусы аккаунтов остаются на экране
+            st.warning("⚠️ Анализ завершен, но данные собраны не для всех аккаунтов")
+            if failed_accounts:
+                st.error(f"❌ Не удалось собрать данные для аккаунтов: {', '.join(failed_accounts)}")
+            if skipped_accounts:
+                st.error(f"❌ {QUOTA_EXCEEDED_MESSAGE}, пропущены аккаунты: {', '.join(skipped_accounts)}")
+        else:
+            for stage in result.stages:
+                status = "✅" if stage.ok else "❌"
+                st.write(f"{status} {stage_titles.get(stage.name, stage.name)}: {stage.seconds:.1f} с")
             
-        except subprocess.CalledProcessError as e:
-            # Очищаем сообщение о загрузке
-            loading_placeholder.empty()
-            error_output = e.stderr if e.stderr else str(e)
-            if "Monthly usage hard limit exceeded" in error_output:
+            error_output = result.error or ""
+            if "Monthly usage hard limit exceeded" in error_output or QUOTA_EXCEEDED_MESSAGE in error_output:
                 st.error("❌ Превышен месячный лимит использования API Apify. " +
                         "Пожалуйста, дождитесь следующего месяца или обновите план подписки.")
             else:
@@ -77,37 +117,18 @@ if st.button("🚀 Применить и запустить анализ", help=
 
 st.divider()
 
-# Try to load data file, fallback to sample data if not found
+# Данные читаются через кэшируемый слой dashboard_data: загрузка и подготовка
+# выполняются один раз на версию файла, а не при каждом действии пользователя
 try:
-    described_path = 'raw_data/described_data.csv'
-    sample_path = 'raw_data/sample_data.csv'
-
-    # Попытка автоматически сгенерировать described_data.csv, если он отсутствует
-    if not os.path.exists(described_path):
-        reels_csv_path = 'raw_data/reels.csv'
-        if os.path.exists(reels_csv_path):
-            try:
-                # Генерируем файл статистики на лету
-                from external_analysis.descriptive_stat import process_data
-                process_data()
-            except Exception as e:
-                st.warning(f"Не удалось сгенерировать described_data.csv автоматически: {e}")
-
-    # После возможной генерации повторно проверяем наличие файла
-    if os.path.exists(described_path):
-        df = pd.read_csv(described_path)
-    elif os.path.exists(sample_path):
-        df = pd.read_csv(sample_path)
-        st.warning("⚠️ Используются демонстрационные данные, так как described_data.csv не найден")
-    else:
-        raise FileNotFoundError("Отсутствуют как described_data.csv, так и sample_data.csv")
+    # Попытка автоматически сгенерировать обработанные данные, если их нет
+    try:
+        dashboard_data.ensure_processed()
+    except Exception as e:
+        st.warning(f"Не удалось сгенерировать обработанные данные автоматически: {e}")
 
-    # Ensure df is a DataFrame and sort by timestamp
-    if isinstance(df, pd.DataFrame):
-        df = df.sort_values(by='timestamp', ascending=False)
-    else:
-        st.error("❌ Ошибка загрузки данных. Данные не являются DataFrame.")
-        st.stop()
+    account_options = dashboard_data.list_accounts()
+    if dashboard_data.uses_sample():
+        st.warning("⚠️ Используются демонстрационные данные, так как обработанные данные не найдены")
 except FileNotFoundError:
     st.error("❌ Файл данных не найден. Убедитесь, что файл raw_data/sample_data.csv существует.")
     st.stop()
@@ -115,69 +136,123 @@ except FileNotFoundError:
 # Выбор аккаунта для просмотра статистики
 selected_account = st.selectbox(
     "Выберите аккаунт для просмотра статистики",
-    options=df['accountName'].unique(),
+    options=account_options,
     help="Выберите аккаунт, для которого хотите посмотреть подробную статистику"
 )
-filtered_df = df[df['accountName'] == selected_account]
+if selected_account is None:
+    st.info("ℹ️ В обработанных данных пока нет reels. Запустите анализ с помощью кнопки выше.")
+    st.stop()
+
+# Только нужные колонки выбранного аккаунта, от новых reels к старым
+filtered_df = dashboard_data.load_account(selected_account)
+data_version = dashboard_data.data_version()
+account_sketches = dashboard_data.load_account_sketches(selected_account)
+# Итоги аккаунта для вкладки общей статистики, посчитанные при обработке данных
+account_summary = dashboard_data.load_account_summary(selected_account)
 st.divider()
 
-tab1, tab2, tab3 = st.tabs(["📊 Общая статистика", "📊 Метрики детально", "📹 Видео"])
-with tab1:
+# Выбор раздела: выполняется только код выбранного раздела, а не всех вкладок
+TAB_OVERVIEW, TAB_METRICS, TAB_VIDEOS = "📊 Общая статистика", "📊 Метрики детально", "📹 Видео"
+selected_tab = st.radio(
+    "Раздел",
+    options=[TAB_OVERVIEW, TAB_METRICS, TAB_VIDEOS],
+    horizontal=True,
+    label_visibility="collapsed"
+)
+
+# Mark-параметр (категория по z-score) для каждой метрики
+MARK_COLUMNS = {
+    'commentsCount': 'markcomments',
+    'likesCount': 'marklikes',
+    'videoPlayCount': 'markvideoPlay',
+    'videoDuration': 'markvideoDuration',
+    'engagementRate': 'markengagementR',
+    'commentRate': 'markcommentR',
+    'likeRate': 'marklikeR',
+    'performanceScore': 'markperformanceScore'
+}
+
+
+def show_video_cards(mark_column, selected_categories):
+    """Постраничные карточки видео аккаунта с категориями selected_categories по mark_column"""
+    # Фильтруем данные по выбранным категориям
+    if mark_column not in filtered_df.columns:
+        # В демонстрационных данных колонки категорий называются иначе
+        st.info(f"Категории {mark_column} недоступны для этих данных — показаны все видео")
+        filtered_videos_df = filtered_df
+    elif selected_categories:
+        filtered_videos_df = filtered_df[filtered_df[mark_column].isin(selected_categories)]
+    else:
+        filtered_videos_df = filtered_df
+
+    # Видео карточки с применением всех фильтров
+    st.divider()
+    st.subheader("Видео карточки")
+
+    if len(filtered_videos_df) > 0:
+        # Постраничный вывод: сначала постеры, плеер загружается только по запросу.
+        # Порядок — от новых к старым, при равном времени по url, одинаковый на всех страницах
+        videos_df = filtered_videos_df.sort_values(['timestamp', 'url'], ascending=[False, True])
+        pages = -(-len(videos_df) // VIDEO_PAGE_SIZE)
+        page = st.number_input(
+            f"Страница (из {pages})",
+            min_value=1,
+            max_value=pages,
+            value=1,
+            step=1,
+            # Новый фильтр начинает с первой страницы
+            key=f"video_page_{selected_account}_{mark_column}_{'|'.join(selected_categories)}"
+        )
+        page_df = videos_df.iloc[(page - 1) * VIDEO_PAGE_SIZE:page * VIDEO_PAGE_SIZE]
+        st.caption(f"Видео {(page - 1) * VIDEO_PAGE_SIZE + 1}–{(page - 1) * VIDEO_PAGE_SIZE + len(page_df)} из {len(videos_df)}")
+
+        for i in range(0, len(page_df), 3):
+            cols = st.columns(3)
+            for j, col in enumerate(cols):
+                if i + j < len(page_df):
+                    row = page_df.iloc[i + j]
+                    with col:
+                        st.markdown(f"**📹 `{row['url']}`**")
+                        if st.toggle("▶️ Смотреть видео", key=f"play_{row['url']}"):
+                            st.video(row['videoUrl'])
+                        elif isinstance(row.get('displayUrl'), str):
+                            st.image(row['displayUrl'], use_column_width=True)
+                        category = f" | {row[mark_column]}" if mark_column in row.index else ""
+                        st.caption(f"👁 {int(row['videoPlayCount'])} | ❤️ {int(row['likesCount'])}{category}")
+    else:
+        st.info("Нет видео, соответствующих выбранным фильтрам")
+
+
+@st.fragment
+def render_overview():
     st.subheader(f"Общая статистика для аккаунта: {selected_account}")
     
     # Блок "Просмотры"
     st.write("**Просмотры:**")
     
-    # Получаем данные о просмотрах
-    views_data = filtered_df['videoPlayCount'].dropna()
-    
-    if len(views_data) > 0:
+    if account_summary['videoPlayCountCount'] > 0:
         # Создаем две колонки для метрик просмотров
         col1, col2 = st.columns(2)
         
         with col1:
-            st.metric("Общее количество просмотров", f"{views_data.sum():,.0f}")
-            st.metric("Среднее количество просмотров", f"{views_data.mean():,.1f}")
+            st.metric("Общее количество просмотров", f"{account_summary['videoPlayCountSum']:,.0f}")
+            st.metric("Среднее количество просмотров", f"{account_summary['videoPlayCountMean']:,.1f}")
         
         with col2:
-            st.metric("Медиана", f"{views_data.median():,.1f}")
-            st.metric("Минимум", f"{views_data.min():,.0f}")
+            st.metric("Медиана", f"{account_summary['videoPlayCountMedian']:,.1f}")
+            st.metric("Минимум", f"{account_summary['videoPlayCountMin']:,.0f}")
         
         # Добавляем максимум в отдельную строку для лучшего отображения
-        st.metric("Максимум", f"{views_data.max():,.0f}")
+        st.metric("Максимум", f"{account_summary['videoPlayCountMax']:,.0f}")
         
         # График просмотров по дате
         st.write("**График просмотров по времени:**")
         
-        # Создаем график просмотров
-        fig_views = px.line(
-            filtered_df.sort_values('timestamp'),
-            x='timestamp',
-            y='videoPlayCount',
+        fig_views = dashboard_charts.time_series_chart(
+            selected_account, 'videoPlayCount', data_version,
             title=f"Просмотры по времени для аккаунта {selected_account}",
-            markers=True
+            color='rgb(31, 119, 180)'
         )
-        
-        fig_views.update_traces(
-            line=dict(color='rgb(31, 119, 180)'),
-            marker=dict(color='white', size=8, line=dict(width=2, color='rgb(31, 119, 180)'))
-        )
-        
-        fig_views.update_layout(
-            xaxis=dict(
-                rangeselector=dict(
-                    buttons=[
-                        dict(step="all", label="Все"),
-                        dict(count=30, label="30д", step="day", stepmode="backward"),
-                        dict(count=60, label="60д", step="day", stepmode="backward"),
-                        dict(count=90, label="90д", step="day", stepmode="backward"),
-                        dict(count=180, label="180д", step="day", stepmode="backward")
-                    ]
-                ),
-            ),
-            yaxis=dict(autorange=True)
-        )
-        
         st.plotly_chart(fig_views, use_container_width=True)
         
     else:
@@ -188,98 +263,42 @@ with tab1:
     # Блок "Лайки"
     st.write("**Лайки:**")
     
-    # Получаем данные о лайках
-    likes_data = filtered_df['likesCount'].dropna()
-    views_data_for_rate = filtered_df['videoPlayCount'].dropna()
-    
-    if len(likes_data) > 0:
+    if account_summary['likesCountCount'] > 0:
         # Создаем две колонки для метрик лайков
         col1, col2 = st.columns(2)
         
         with col1:
-            st.metric("Общее количество лайков", f"{likes_data.sum():,.0f}")
-            st.metric("Среднее количество лайков", f"{likes_data.mean():,.1f}")
-            # Рассчитываем LikeRate
-            total_likes = likes_data.sum()
-            total_views = views_data_for_rate.sum()
-            like_rate = (total_likes / total_views * 100) if total_views > 0 else 0
-            st.metric("LikeRate (лайки/просмотры)", f"{like_rate:.2f}%")
+            st.metric("Общее количество лайков", f"{account_summary['likesCountSum']:,.0f}")
+            st.metric("Среднее количество лайков", f"{account_summary['likesCountMean']:,.1f}")
+            # Лайки на просмотр: все лайки аккаунта к всем просмотрам
+            likes_per_view = account_summary['likesPerView'] * 100
+            st.metric("Лайки на просмотр (лайки/просмотры)", f"{likes_per_view:.2f}%")
         
         with col2:
-            st.metric("Медиана", f"{likes_data.median():,.1f}")
-            st.metric("Минимум", f"{likes_data.min():,.0f}")
-            st.metric("Максимум", f"{likes_data.max():,.0f}")
+            st.metric("Медиана", f"{account_summary['likesCountMedian']:,.1f}")
+            st.metric("Минимум", f"{account_summary['likesCountMin']:,.0f}")
+            st.metric("Максимум", f"{account_summary['likesCountMax']:,.0f}")
         
         # График лайков по дате
         st.write("**График лайков по времени:**")
         
-        # Создаем график лайков
-        fig_likes = px.line(
-            filtered_df.sort_values('timestamp'),
-            x='timestamp',
-            y='likesCount',
+        fig_likes = dashboard_charts.time_series_chart(
+            selected_account, 'likesCount', data_version,
             title=f"Лайки по времени для аккаунта {selected_account}",
-            markers=True
+            color='rgb(220, 53, 69)'
         )
-        
-        fig_likes.update_traces(
-            line=dict(color='rgb(220, 53, 69)'),
-            marker=dict(color='white', size=8, line=dict(width=2, color='rgb(220, 53, 69)'))
-        )
-        
-        fig_likes.update_layout(
-            xaxis=dict(
-                rangeselector=dict(
-                    buttons=[
-                        dict(step="all", label="Все"),
-                        dict(count=30, label="30д", step="day", stepmode="backward"),
-                        dict(count=60, label="60д", step="day", stepmode="backward"),
-                        dict(count=90, label="90д", step="day", stepmode="backward"),
-                        dict(count=180, label="180д", step="day", stepmode="backward")
-                    ]
-                ),
-            ),
-            yaxis=dict(autorange=True)
-        )
-        
         st.plotly_chart(fig_likes, use_container_width=True)
         
-        # График LikeRate по дате
-        st.write("**График LikeRate по времени:**")
-        
-        # Используем готовую колонку likeRate (умножаем на 100 для процентов)
-        filtered_df_with_rate = filtered_df.copy()
-        filtered_df_with_rate['likeRatePercent'] = filtered_df_with_rate['likeRate'] * 100
-        
-        # Создаем график LikeRate
-        fig_like_rate = px.line(
-            filtered_df_with_rate.sort_values('timestamp'),
-            x='timestamp',
-            y='likeRatePercent',
-            title=f"LikeRate по времени для аккаунта {selected_account}",
-            markers=True
-        )
-        
-        fig_like_rate.update_traces(
-            line=dict(color='rgb(255, 193, 7)'),
-            marker=dict(color='white', size=8, line=dict(width=2, color='rgb(255, 193, 7)'))
-        )
+        # График лайков на подписчика по дате
+        st.write("**График лайков на подписчика по времени:**")
         
-        fig_like_rate.update_layout(
-            xaxis=dict(
-                rangeselector=dict(
-                    buttons=[
-                        dict(step="all", label="Все"),
-                        dict(count=30, label="30д", step="day", stepmode="backward"),
-                        dict(count=60, label="60д", step="day", stepmode="backward"),
-                        dict(count=90, label="90д", step="day", stepmode="backward"),
-                        dict(count=180, label="180д", step="day", stepmode="backward")
-                    ]
-                ),
-            ),
-            yaxis=dict(autorange=True, title="LikeRate (%)")
+        # Готовая колонка likeRate (лайки/подписчики) в процентах
+        fig_like_rate = dashboard_charts.time_series_chart(
+            selected_account, 'likesPerFollowerPercent', data_version,
+            title=f"Лайки на подписчика по времени для аккаунта {selected_account}",
+            color='rgb(255, 193, 7)',
+            y_title="Лайки/подписчики (%)"
         )
-        
         st.plotly_chart(fig_like_rate, use_container_width=True)
         
     else:
@@ -290,202 +309,98 @@ with tab1:
     # Блок "Комментарии"
     st.write("**Комментарии:**")
     
-    # Получаем данные о комментариях
-    comments_data = filtered_df['commentsCount'].dropna()
-    views_data_for_comment_rate = filtered_df['videoPlayCount'].dropna()
-    likes_data_for_like_comment_rate = filtered_df['likesCount'].dropna()
-    
-    if len(comments_data) > 0:
+    if account_summary['commentsCountCount'] > 0:
         # Создаем две колонки для метрик комментариев
         col1, col2 = st.columns(2)
         
         with col1:
-            st.metric("Общее количество комментариев", f"{comments_data.sum():,.0f}")
-            st.metric("Среднее количество комментариев", f"{comments_data.mean():,.1f}")
-            # Рассчитываем CommentRate
-            total_comments = comments_data.sum()
-            total_views = views_data_for_comment_rate.sum()
-            comment_rate = (total_comments / total_views * 100) if total_views > 0 else 0
-            st.metric("CommentRate (комменты/просмотры)", f"{comment_rate:.2f}%")
+            st.metric("Общее количество комментариев", f"{account_summary['commentsCountSum']:,.0f}")
+            st.metric("Среднее количество комментариев", f"{account_summary['commentsCountMean']:,.1f}")
+            # Комментарии на просмотр: все комментарии аккаунта к всем просмотрам
+            comments_per_view = account_summary['commentsPerView'] * 100
+            st.metric("Комментарии на просмотр (комменты/просмотры)", f"{comments_per_view:.2f}%")
         
         with col2:
-            # Рассчитываем Like-CommentRate (комментарии/лайки)
-            total_likes = likes_data_for_like_comment_rate.sum()
-            like_comment_rate = (total_comments / total_likes * 100) if total_likes > 0 else 0
-            st.metric("Like-CommentRate (комменты/лайки)", f"{like_comment_rate:.2f}%")
-            st.metric("Медиана", f"{comments_data.median():,.1f}")
-            st.metric("Минимум", f"{comments_data.min():,.0f}")
+            # Комментарии на лайк: все комментарии аккаунта к всем лайкам
+            comments_per_like = account_summary['commentsPerLike'] * 100
+            st.metric("Комментарии на лайк (комменты/лайки)", f"{comments_per_like:.2f}%")
+            st.metric("Медиана", f"{account_summary['commentsCountMedian']:,.1f}")
+            st.metric("Минимум", f"{account_summary['commentsCountMin']:,.0f}")
         
         # Добавляем максимум в отдельную строку для лучшего отображения
-        st.metric("Максимум", f"{comments_data.max():,.0f}")
+        st.metric("Максимум", f"{account_summary['commentsCountMax']:,.0f}")
         
         # График комментариев по дате
         st.write("**График комментариев по времени:**")
         
-        # Создаем график комментариев
-        fig_comments = px.line(
-            filtered_df.sort_values('timestamp'),
-            x='timestamp',
-            y='commentsCount',
+        fig_comments = dashboard_charts.time_series_chart(
+            selected_account, 'commentsCount', data_version,
             title=f"Комментарии по времени для аккаунта {selected_account}",
-            markers=True
-        )
-        
-        fig_comments.update_traces(
-            line=dict(color='rgb(40, 167, 69)'),
-            marker=dict(color='white', size=8, line=dict(width=2, color='rgb(40, 167, 69)'))
-        )
-        
-        fig_comments.update_layout(
-            xaxis=dict(
-                rangeselector=dict(
-                    buttons=[
-                        dict(step="all", label="Все"),
-                        dict(count=30, label="30д", step="day", stepmode="backward"),
-                        dict(count=60, label="60д", step="day", stepmode="backward"),
-                        dict(count=90, label="90д", step="day", stepmode="backward"),
-                        dict(count=180, label="180д", step="day", stepmode="backward")
-                    ]
-                ),
-            ),
-            yaxis=dict(autorange=True)
+            color='rgb(40, 167, 69)'
         )
-        
         st.plotly_chart(fig_comments, use_container_width=True)
         
-        # График CommentRate по дате
-        st.write("**График CommentRate по времени:**")
-        
-        # Используем готовую колонку commentRate (умножаем на 100 для процентов)
-        filtered_df_with_comment_rate = filtered_df.copy()
-        filtered_df_with_comment_rate['commentRatePercent'] = filtered_df_with_comment_rate['commentRate'] * 100
-        
-        # Создаем график CommentRate
-        fig_comment_rate = px.line(
-            filtered_df_with_comment_rate.sort_values('timestamp'),
-            x='timestamp',
-            y='commentRatePercent',
-            title=f"CommentRate по времени для аккаунта {selected_account}",
-            markers=True
-        )
-        
-        fig_comment_rate.update_traces(
-            line=dict(color='rgb(108, 117, 125)'),
-            marker=dict(color='white', size=8, line=dict(width=2, color='rgb(108, 117, 125)'))
-        )
+        # График комментариев на подписчика по дате
+        st.write("**График комментариев на подписчика по времени:**")
         
-        fig_comment_rate.update_layout(
-            xaxis=dict(
-                rangeselector=dict(
-                    buttons=[
-                        dict(step="all", label="Все"),
-                        dict(count=30, label="30д", step="day", stepmode="backward"),
-                        dict(count=60, label="60д", step="day", stepmode="backward"),
-                        dict(count=90, label="90д", step="day", stepmode="backward"),
-                        dict(count=180, label="180д", step="day", stepmode="backward")
-                    ]
-                ),
-            ),
-            yaxis=dict(autorange=True, title="CommentRate (%)")
+        # Готовая колонка commentRate (комментарии/подписчики) в процентах
+        fig_comment_rate = dashboard_charts.time_series_chart(
+            selected_account, 'commentsPerFollowerPercent', data_version,
+            title=f"Комментарии на подписчика по времени для аккаунта {selected_account}",
+            color='rgb(108, 117, 125)',
+            y_title="Комментарии/подписчики (%)"
         )
-        
         st.plotly_chart(fig_comment_rate, use_container_width=True)
         
-        # Рассчитываем Like-CommentRate для каждого видео (комментарии/лайки)
-        filtered_df_with_like_comment_rate = filtered_df.copy()
-        
-        # Улучшенный расчет с защитой от экстремальных значений
-        def safe_comment_rate_calculation(row):
-            likes = row['likesCount']
-            comments = row['commentsCount']
-            
-            # Если лайков меньше 5, считаем соотношение ненадежным
-            if likes < 5:
-                return 0  # или np.nan для исключения из графика
-            
-            ratio = (comments / likes) * 100
-            
-            # Ограничиваем максимальное соотношение до 200%
-            # (в реальности комментарии редко превышают 50% от лайков)
-            return min(ratio, 200)
-        
-        filtered_df_with_like_comment_rate['likeCommentRatePercent'] = filtered_df_with_like_comment_rate.apply(
-            safe_comment_rate_calculation, axis=1
+        # Комментарии на лайк для каждого видео (не меньше 5 лайков, не больше 200%)
+        fig_like_comment_rate = dashboard_charts.time_series_chart(
+            selected_account, 'commentsPerLikePercent', data_version,
+            title=f"Комментарии на лайк по времени для аккаунта {selected_account}",
+            color='rgb(153, 102, 255)',
+            y_title="Комментарии/лайки (%)"
         )
-        
-        # Создаем график Like-CommentRate
-        fig_like_comment_rate = px.line(
-            filtered_df_with_like_comment_rate.sort_values('timestamp'),
-            x='timestamp',
-            y='likeCommentRatePercent',
-            title=f"Like-CommentRate по времени для аккаунта {selected_account}",
-            markers=True
-        )
-        
-        fig_like_comment_rate.update_traces(
-            line=dict(color='rgb(153, 102, 255)'),
-            marker=dict(color='white', size=8, line=dict(width=2, color='rgb(153, 102, 255)'))
-        )
-        
-        fig_like_comment_rate.update_layout(
-            xaxis=dict(
-                rangeselector=dict(
-                    buttons=[
-                        dict(step="all", label="Все"),
-                        dict(count=30, label="30д", step="day", stepmode="backward"),
-                        dict(count=60, label="60д", step="day", stepmode="backward"),
-                        dict(count=90, label="90д", step="day", stepmode="backward"),
-                        dict(count=180, label="180д", step="day", stepmode="backward")
-                    ]
-                ),
-            ),
-            yaxis=dict(autorange=True, title="Like-CommentRate (%)")
-        )
-        
         st.plotly_chart(fig_like_comment_rate, use_container_width=True)
         
     else:
         st.warning("Нет данных о комментариях")
 
-with tab2:
+
+
+@st.fragment
+def render_metric_details():
     metrics_for_plot = ['likesCount', 'commentsCount', 'videoPlayCount']
     selected_metric = st.selectbox("Выбери метрику для графика", metrics_for_plot)
+    baseline_windows = {"Вся история": None, **{f"{window}д": window for window in BASELINE_WINDOWS_DAYS}}
+    baseline_window = baseline_windows[st.radio(
+        "Базовый период для порогов HOT / Very Successful",
+        options=list(baseline_windows),
+        horizontal=True,
+        help="Пороги считаются по reels аккаунта за выбранное число дней перед каждой публикацией"
+    )]
     st.markdown("<br>", unsafe_allow_html=True)
 
     st.subheader(f"График по {selected_metric}")
 
-    fig = px.line(
-        filtered_df.sort_values('timestamp'),
-        x='timestamp',
-        y=selected_metric,
-        title=f"{selected_metric} по времени для аккаунта {selected_account}",
-        markers=True
-    )
+    # Скользящие пороги: μ и σ аккаунта за окно перед каждым reel уже посчитаны при обработке
+    metric_data = filtered_df[selected_metric].dropna()
+    mean_column, std_column = baseline_columns(selected_metric, baseline_window) if baseline_window else (None, None)
+    rolling_thresholds = bool(baseline_window) and mean_column in filtered_df.columns
+    threshold_lines = ((
+        (mean_column, std_column, stdev_hot_treshold, "red", f"HOT порог: μ+{stdev_hot_treshold}σ за {baseline_window}д"),
+        (mean_column, std_column, stdev_very_successful_treshold, "green",
+         f"✅ Very Successful: μ+{stdev_very_successful_treshold}σ за {baseline_window}д"),
+    ) if rolling_thresholds else ())
 
     # Красивый глубокий фиолетовый цвет для контраста с красной линией
-    fig.update_traces(
-        line=dict(color='rgb(102, 51, 153)'),  # Элегантный глубокий фиолетовый
-        marker=dict(color='white', size=8, line=dict(width=2, color='rgb(102, 51, 153)'))
-    )
-
-    fig.update_layout(
-        xaxis=dict(
-            rangeselector=dict(
-                buttons=[
-                    dict(step="all", label="Все"),
-                    dict(count=30, label="30д", step="day", stepmode="backward"),
-                    dict(count=60, label="60д", step="day", stepmode="backward"),
-                    dict(count=90, label="90д", step="day", stepmode="backward"),
-                    dict(count=180, label="180д", step="day", stepmode="backward")
-                ]
-            ),
-        ),
-        yaxis=dict(autorange=True)  # ✅ Автоподстройка Y при изменении диапазона
+    fig = dashboard_charts.time_series_chart(
+        selected_account, selected_metric, data_version,
+        title=f"{selected_metric} по времени для аккаунта {selected_account}",
+        color='rgb(102, 51, 153)',
+        threshold_lines=threshold_lines
     )
     
-    # Добавляем горизонтальную красную линию на уровне μ + stdev_hot_threshold * σ
-    metric_data = filtered_df[selected_metric].dropna()
-    if len(metric_data) > 0:
+    # Без скользящих порогов — горизонтальные линии на уровне μ + k·σ за всю историю
+    if not rolling_thresholds and len(metric_data) > 0:
         # Красная линия для HOT порога
         hot_threshold_value = metric_data.mean() + stdev_hot_treshold * metric_data.std()
         fig.add_hline(
@@ -538,15 +453,25 @@ with tab2:
             st.metric("Отношение к общим просмотрам", f"{ratio_to_total_views:.2f}%")
             st.metric("Максимум", f"{metric_data.max():,.0f}")
 
-        # Расширенные метрики в спойлере
-        with st.expander("🔍 Расширенные метрики"):
+        # Расширенные метрики считаются только когда переключатель включен
+        if st.toggle("🔍 Расширенные метрики", value=False):
             st.markdown("<br>", unsafe_allow_html=True)
 
+            # Квантили берем из скетча аккаунта, посчитанного при обработке;
+            # для демонстрационных данных считаем их напрямую
+            percentiles = [99, 90, 75, 50, 25, 10, 5]
+            quantile_levels = np.array([0.25, 0.75] + [p / 100 for p in percentiles])
+            sketch = account_sketches.get((selected_account, selected_metric))
+            if sketch is not None:
+                quantile_values = sketch.quantile(quantile_levels)
+            else:
+                quantile_values = metric_data.quantile(quantile_levels).to_numpy()
+            q1, q3 = quantile_values[:2]
+            percentile_values = dict(zip(percentiles, quantile_values[2:]))
+            
             # Статистические выбросы
             st.write("**Статистические выбросы:**")
             
-            q1 = metric_data.quantile(0.25)
-            q3 = metric_data.quantile(0.75)
             iqr = q3 - q1
             
             col1, col2 = st.columns(2)
@@ -562,8 +487,6 @@ with tab2:
 
             # Перцентили
             st.write("**Перцентили:**")
-            percentiles = [99, 90, 75, 50, 25, 10, 5]
-            percentile_values = {p: metric_data.quantile(p/100) for p in percentiles}
             
             col1, col2, col3 = st.columns(3)
             for i, p in enumerate(percentiles):
@@ -571,64 +494,26 @@ with tab2:
                     st.metric(f"{p}-й перцентиль", f"{percentile_values[p]:,.1f}")
             st.divider()
             
+            # Количество и сумма в диапазонах перцентилей: одна сортировка на
+            # все диапазоны, границы [нижняя, верхняя) — каждый reel в одном диапазоне
+            range_table = percentile_range_table(metric_data, quantiles=percentile_values)
+
             # Сумма метрики в диапазонах перцентилей
             st.write(f"**Сумма {selected_metric} в диапазонах перцентилей:**")
             
-            # Создаем диапазоны перцентилей
-            percentile_ranges = [
-                (100, 99, "100-99"),
-                (99, 90, "99-90"),
-                (90, 75, "90-75"),
-                (75, 50, "75-50"),
-                (50, 25, "50-25"),
-                (25, 10, "25-10"),
-                (10, 5, "10-5"),
-                (5, 0, "5-0")
-            ]
-            
-            total_sum = metric_data.sum()
-            
             col1, col2 = st.columns(2)
-            for i, (upper_p, lower_p, label) in enumerate(percentile_ranges):
-                if upper_p == 100:
-                    upper_val = metric_data.max()
-                else:
-                    upper_val = percentile_values[upper_p]
-                
-                if lower_p == 0:
-                    lower_val = metric_data.min()
-                else:
-                    lower_val = percentile_values[lower_p]
-                
-                range_sum = metric_data[(metric_data >= lower_val) & (metric_data <= upper_val)].sum()
-                percentage = (range_sum / total_sum * 100) if total_sum > 0 else 0
-                
+            for i, (label, row) in enumerate(range_table.iterrows()):
                 with [col1, col2][i % 2]:
-                    st.metric(f"Диапазон {label}%", f"{range_sum:,.0f} ({percentage:.1f}%)")
+                    st.metric(f"Диапазон {label}%", f"{row['sum']:,.0f} ({row['sumShare']:.1f}%)")
             st.divider()
 
             # Количество REELS в диапазонах перцентилей
             st.write("**Количество REELS в диапазонах перцентилей:**")
             
-            total_count = len(metric_data)
-            
             col1, col2 = st.columns(2)
-            for i, (upper_p, lower_p, label) in enumerate(percentile_ranges):
-                if upper_p == 100:
-                    upper_val = metric_data.max()
-                else:
-                    upper_val = percentile_values[upper_p]
-                
-                if lower_p == 0:
-                    lower_val = metric_data.min()
-                else:
-                    lower_val = percentile_values[lower_p]
-                
-                range_count = len(metric_data[(metric_data >= lower_val) & (metric_data <= upper_val)])
-                count_percentage = (range_count / total_count * 100) if total_count > 0 else 0
-                
+            for i, (label, row) in enumerate(range_table.iterrows()):
                 with [col1, col2][i % 2]:
-                    st.metric(f"Диапазон {label}%", f"{range_count} ({count_percentage:.1f}%)")
+                    st.metric(f"Диапазон {label}%", f"{row['count']:.0f} ({row['countShare']:.1f}%)")
             st.divider()
             
             # Метрики устойчивости
@@ -650,22 +535,10 @@ with tab2:
         # Фильтрация по mark-параметрам
         st.subheader("Фильтры видео")
         
-        # Определяем какой mark-параметр использовать в зависимости от выбранной метрики
-        mark_columns = {
-            'commentsCount': 'markcomments',
-            'likesCount': 'marklikes',
-            'videoPlayCount': 'markvideoPlay',
-            'videoDuration': 'markvideoDuration',
-            'engagementRate': 'markengagementR',
-            'commentRate': 'markcommentR',
-            'likeRate': 'marklikeR',
-            'performanceScore': 'markperformanceScore'
-        }
-        
-        mark_column = mark_columns[selected_metric]
+        mark_column = MARK_COLUMNS[selected_metric]
         
         # Получаем все возможные значения категорий
-        category_options = ['🔥viral hit', '✅very successful', 'successful', 'average', 'weak']
+        category_options = list(reversed(Z_CATEGORIES))
         
         # Фильтр с предустановленным значением '🔥viral hit'
         selected_categories = st.multiselect(
@@ -674,28 +547,32 @@ with tab2:
             default=['🔥viral hit']
         )
         
-                # Фильтруем данные по выбранным категориям
-        if selected_categories:
-            filtered_videos_df = filtered_df[filtered_df[mark_column].isin(selected_categories)]
-        else:
-            filtered_videos_df = filtered_df
-        
-        # Видео карточки с применением всех фильтров
-        st.divider()
-        st.subheader("Видео карточки")
-        
-        if len(filtered_videos_df) > 0:
-            for i in range(0, len(filtered_videos_df), 3):
-                cols = st.columns(3)
-                for j, col in enumerate(cols):
-                    if i + j < len(filtered_videos_df):
-                        row = filtered_videos_df.iloc[i + j]
-                        with col:
-                            st.markdown(f"**📹 `{row['url']}`**")
-                            st.video(row['videoUrl'])
-                            st.caption(f"👁 {int(row['videoPlayCount'])} | ❤️ {int(row['likesCount'])} | {row[mark_column]}")
-        else:
-            st.info("Нет видео, соответствующих выбранным фильтрам")
+        show_video_cards(mark_column, selected_categories)
     
     else:
         st.warning("Нет данных для выбранной метрики")
+
+
+@st.fragment
+def render_videos():
+    st.subheader(f"Видео аккаунта: {selected_account}")
+    selected_metric = st.selectbox("Категория по метрике", ['videoPlayCount', 'likesCount', 'commentsCount'],
+                                   key="videos_metric")
+    mark_column = MARK_COLUMNS[selected_metric]
+    selected_categories = st.multiselect(
+        f"Фильтр по категории ({mark_column})",
+        options=list(reversed(Z_CATEGORIES)),
+        default=[],
+        key="videos_categories"
+    )
+    show_video_cards(mark_column, selected_categories)
+
+
+# Фрагменты (st.fragment): при изменении своих виджетов перезапускается
+# только функция раздела, а не весь дашборд
+if selected_tab == TAB_OVERVIEW:
+    render_overview()
+elif selected_tab == TAB_METRICS:
+    render_metric_details()
+elif selected_tab == TAB_VIDEOS:
+    render_videos()
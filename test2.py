@@ -1,8 +1,8 @@
 import streamlit as st
-import pandas as pd
 import matplotlib.pyplot as plt
+from data_loader.storage import described_store
 
-df = pd.read_csv('raw_data/described_data.csv')
+df = described_store().read(columns=['videoPlayCount', 'videoUrl'])
 df = df.sort_values(by='videoPlayCount', ascending=False).head(1)
 
 df[['videoUrl']].to_csv('input_data/videos.csv', index=False)
@@ -0,0 +1,79 @@
+"""
+Local stand-in for ApifyClient with the interface the scraping engine uses.
+
+Accounts in fail_run make the actor call raise; accounts in fail_mid_stream
+make the dataset raise after its first page, so the group fails partway.
+"""
+
+import itertools
+import threading
+
+
+class _Page:
+    def __init__(self, items):
+        self.items = items
+
+
+class FakeDataset:
+    def __init__(self, items, fail_after_first_page=False):
+        self._items = items
+        self._fail = fail_after_first_page
+
+    def list_items(self, offset=0, limit=None):
+        if self._fail and offset > 0:
+            raise RuntimeError("dataset read failed")
+        return _Page(self._items[offset:None if limit is None else offset + limit])
+
+
+class FakeActor:
+    def __init__(self, client):
+        self.client = client
+
+    def call(self, run_input=None):
+        client = self.client
+        with client.lock:
+            client.calls.append(run_input)
+        accounts = run_input['username']
+        for account in accounts:
+            if account in client.fail_run:
+                raise RuntimeError(f"actor failed for {account}")
+        items = [item for account in accounts for item in make_items(account, run_input.get('resultsLimit', 10))]
+        with client.lock:
+            dataset_id = f'ds{next(client.ids)}'
+            client.datasets[dataset_id] = FakeDataset(
+                items, fail_after_first_page=any(account in client.fail_mid_stream for account in accounts))
+        return {'id': f'run-{dataset_id}', 'status': 'SUCCEEDED', 'defaultDatasetId': dataset_id}
+
+
+class FakeClient:
+    def __init__(self, fail_run=(), fail_mid_stream=()):
+        self.fail_run = set(fail_run)
+        self.fail_mid_stream = set(fail_mid_stream)
+        self.calls = []
+        self.datasets = {}
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+
+    def actor(self, actor_id):
+        return FakeActor(self)
+
+    def dataset(self, dataset_id):
+        return self.datasets[dataset_id]
+
+
+def make_items(account, count, tag='new'):
+    """Reels of an account as the actor returns them (ownerUsername in lowercase)."""
+    owner = account.lower()
+    return [
+        {
+            'id': f'{owner}_{i}',
+            'shortCode': f'{owner}{i}',
+            'ownerUsername': owner,
+            'timestamp': f'2026-0{1 + i % 9}-1{i % 10}T10:00:00.000Z',
+            'videoPlayCount': 100 * i,
+            'likesCount': 10 * i,
+            'commentsCount': i,
+            'caption': tag,
+        }
+        for i in range(count)
+    ]
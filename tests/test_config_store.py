@@ -0,0 +1,62 @@
+import json
+import os
+import threading
+
+import pytest
+
+from config_store import ConfigStore, StoredDict
+
+
+def test_read_picks_up_external_writes(tmp_path):
+    path = str(tmp_path / 'settings.json')
+    store = ConfigStore(path, defaults={'limit': 10})
+    assert store.read() == {'limit': 10}
+    assert store.read() is store.read()
+
+    # Another process (here another store) replaces the file
+    ConfigStore(path).update({'limit': 25, 'accounts': ['a']})
+    assert store.changed()
+    assert store.read() == {'limit': 25, 'accounts': ['a']}
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'limit': 5}, f)
+    assert store.get('limit') == 5
+
+
+def test_failed_validation_leaves_file_unchanged(tmp_path):
+    path = str(tmp_path / 'settings.json')
+    store = ConfigStore(path)
+    store.update({'limit': 10})
+    with open(path, 'rb') as f:
+        before = f.read()
+
+    def validate(data):
+        if data['limit'] < 1:
+            raise ValueError('limit must be positive')
+
+    with pytest.raises(ValueError):
+        store.update({'limit': 0}, validate=validate)
+
+    with open(path, 'rb') as f:
+        assert f.read() == before
+    assert store.read() == {'limit': 10}
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.json')] == ['settings.json']
+
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    path = str(tmp_path / 'settings.json')
+    ConfigStore(path).update({'input': {}})
+
+    def worker(i):
+        # Every thread has its own store, as separate dashboard processes would
+        values = StoredDict(ConfigStore(path), 'input')
+        for j in range(20):
+            values.update_values({f'{i}-{j}': j})
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(ConfigStore(path).read()['input']) == 8 * 20
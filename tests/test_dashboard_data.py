@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+import dashboard_data
+from data_loader.storage import described_store
+from external_analysis.derived_metrics import DASHBOARD_METRICS, computable
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    root = str(tmp_path / 'described')
+    monkeypatch.setattr(dashboard_data, 'described_store', lambda root_=None: described_store(root_ or root))
+    monkeypatch.setattr(dashboard_data, 'ACCOUNT_SUMMARY_PATH', str(tmp_path / 'account_summary.parquet'))
+    dashboard_data.clear_cache()
+    yield described_store(root)
+    dashboard_data.clear_cache()
+
+
+def test_empty_store_has_no_accounts(store):
+    # A successful scrape without reels writes a store with only a schema
+    store.overwrite(pd.DataFrame())
+
+    assert dashboard_data.list_accounts() == []
+    assert dashboard_data.load_account(None).empty
+    assert dashboard_data.load_account_summary(None) is None
+
+
+def test_unknown_account_has_no_summary(store):
+    store.overwrite(pd.DataFrame({
+        'accountName': ['alpha', 'alpha'],
+        'timestamp': pd.to_datetime(['2024-01-01', '2024-01-02'], utc=True),
+        'videoPlayCount': [100, 200], 'likesCount': [10, 20], 'commentsCount': [1, 2],
+        'likeRate': [0.01, 0.02], 'commentRate': [0.001, 0.002],
+    }))
+
+    assert dashboard_data.list_accounts() == ['alpha']
+    assert dashboard_data.load_account_summary('alpha')['videoPlayCountSum'] == 300
+    assert dashboard_data.load_account_summary('beta') is None
+
+
+def test_metrics_without_inputs_are_skipped():
+    names = [metric.name for metric in DASHBOARD_METRICS]
+    assert computable(names, ['accountName']) == []
+    assert computable(names, ['likesCount', 'commentsCount']) == ['commentsPerLikePercent']
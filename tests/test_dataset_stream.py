@@ -0,0 +1,61 @@
+import pandas as pd
+
+from data_loader.dataset_stream import StoreItemWriter
+from data_loader.scraping_engine import scrape_accounts
+from data_loader.storage import reels_store
+from fake_apify import FakeClient, make_items
+
+RUN_INPUT = {'username': ['alpha', 'beta', 'gamma'], 'resultsLimit': 10}
+
+
+def scrape_into(store, client, mode):
+    with StoreItemWriter(store, mode=mode) as writer:
+        report = scrape_accounts(client, RUN_INPUT, sink=writer, accounts_per_run=1, page_size=4)
+    return report
+
+
+def test_failed_group_pages_are_not_written(tmp_path):
+    store = reels_store(str(tmp_path / 'reels'))
+    report = scrape_into(store, FakeClient(fail_mid_stream={'beta'}), mode='upsert')
+
+    assert sorted(report.succeeded) == ['alpha', 'gamma']
+    assert report.failed == ['beta']
+    df = store.read()
+    assert set(df['ownerUsername']) == {'alpha', 'gamma'}
+    assert len(df) == 20
+
+
+def test_overwrite_keeps_stored_reels_of_failed_accounts(tmp_path):
+    store = reels_store(str(tmp_path / 'reels'))
+    old = pd.DataFrame(make_items('alpha', 3, tag='old') + make_items('beta', 5, tag='old'))
+    store.overwrite(old)
+
+    scrape_into(store, FakeClient(fail_mid_stream={'beta'}), mode='overwrite')
+
+    df = store.read()
+    beta = df[df['ownerUsername'] == 'beta']
+    assert len(beta) == 5 and (beta['caption'] == 'old').all()
+    alpha = df[df['ownerUsername'] == 'alpha']
+    assert len(alpha) == 10 and (alpha['caption'] == 'new').all()
+    assert len(df[df['ownerUsername'] == 'gamma']) == 10
+
+
+def test_group_spools_are_open_only_while_their_run_is(tmp_path):
+    class CountingWriter(StoreItemWriter):
+        most_open = 0
+
+        def open_group(self, accounts=()):
+            group = super().open_group(accounts)
+            with self._lock:
+                self.most_open = max(self.most_open, len(self._groups))
+            return group
+
+    accounts = [f'user{i}' for i in range(60)]
+    store = reels_store(str(tmp_path / 'reels'))
+    with CountingWriter(store, mode='overwrite') as writer:
+        report = scrape_accounts(FakeClient(), {'username': accounts, 'resultsLimit': 2}, sink=writer,
+                                 accounts_per_run=1, max_concurrency=4)
+
+    assert len(report.succeeded) == 60
+    assert 1 <= writer.most_open <= 4
+    assert len(store.read()) == 120
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from external_analysis.account_summary import account_summary
+from external_analysis.derived_metrics import (DASHBOARD_METRICS, PIPELINE_METRICS, DerivedMetric, evaluate,
+                                               resolve_order)
+
+
+def test_pipeline_metrics_match_formulas():
+    df = pd.DataFrame({
+        'likesCount': [10.0, 0.0, np.nan], 'commentsCount': [2, 0, 1],
+        'videoPlayCount': [1000, 50, 10], 'followersCount': [100, 200, 50],
+    })
+    out = evaluate(df.copy(), [metric.name for metric in PIPELINE_METRICS])
+
+    np.testing.assert_array_equal(out['engagementRate'], (df['likesCount'] + df['commentsCount']) / df['followersCount'])
+    np.testing.assert_array_equal(out['likeCommentRate'], [5.0, 0.0, np.nan])
+    np.testing.assert_array_equal(out['performanceScore'], (out['engagementRate'] + out['viralityIndex']) / 2)
+
+
+def test_comments_per_like_guard_and_cap():
+    df = pd.DataFrame({'likesCount': [4, 5, 10, 0], 'commentsCount': [3, 1, 50, 0]})
+    out = evaluate(df, ['commentsPerLikePercent'])
+    np.testing.assert_array_equal(out['commentsPerLikePercent'], [0.0, 20.0, 200.0, 0.0])
+
+
+def test_existing_dependency_columns_are_not_recomputed():
+    # likeRate comes from the pipeline; the dashboard has no followersCount
+    df = pd.DataFrame({'likeRate': [0.5], 'commentRate': [0.1], 'likesCount': [10], 'commentsCount': [1]})
+    out = evaluate(df, [metric.name for metric in DASHBOARD_METRICS])
+    assert out['likesPerFollowerPercent'].iloc[0] == 50.0
+
+
+def test_circular_dependencies_are_rejected():
+    registry = {
+        'a': DerivedMetric('a', ('b',), lambda b: b),
+        'b': DerivedMetric('b', ('a',), lambda a: a),
+    }
+    with pytest.raises(ValueError):
+        resolve_order(['a'], registry)
+
+
+def test_summary_ratios_are_zero_without_denominator():
+    df = pd.DataFrame({
+        'accountName': ['a', 'a', 'b'],
+        'videoPlayCount': [100, 300, 0], 'likesCount': [10, 30, 0], 'commentsCount': [1, 3, 2],
+    })
+    summary = account_summary(df)
+    assert summary.loc['a', 'likesPerView'] == pytest.approx(0.1)
+    assert summary.loc['a', 'commentsPerLike'] == pytest.approx(0.1)
+    assert summary.loc['b', 'likesPerView'] == 0.0
+    assert summary.loc['b', 'commentsPerLike'] == 0.0
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader.storage import described_store, reels_store
+from external_analysis import descriptive_stat
+from external_analysis.descriptive_stat import METRICS, process_data, process_incremental
+from external_analysis.quantile_sketch import load_sketches
+
+FOLLOWERS = {'a': 1000, 'b': 5000, 'c': 200, 'd': 800, 'e': 3000, 'f': 50}
+Z_COLUMNS = [f'z{metric}' for metric in METRICS]
+
+
+def make_raw(rng, ids, accounts):
+    n = len(ids)
+    return pd.DataFrame({
+        'id': [str(i) for i in ids],
+        'ownerUsername': rng.choice(accounts, n),
+        'timestamp': pd.Timestamp('2024-01-01', tz='UTC') + pd.to_timedelta(rng.integers(0, 200, n), unit='D'),
+        'videoPlayCount': rng.integers(1, 1_000_000, n).astype('float64'),
+        'likesCount': rng.integers(0, 10_000, n).astype('float64'),
+        'commentsCount': rng.integers(0, 100, n).astype('float64'),
+        'caption': 'x', 'url': 'u', 'videoUrl': 'v', 'displayUrl': 'd',
+        'videoDuration': rng.uniform(5, 60, n),
+    })
+
+
+def run(raw, tmp_path, name, baseline, incremental=False, **kwargs):
+    paths = {
+        'store': described_store(str(tmp_path / name)),
+        'stats_path': str(tmp_path / f'{name}_stats.parquet'),
+        'sketch_path': str(tmp_path / f'{name}_sketches.parquet'),
+        'summary_path': str(tmp_path / f'{name}_summary.parquet'),
+    }
+    process = process_incremental if incremental else process_data
+    output = process(raw, baseline=baseline, followers=FOLLOWERS, **paths, **kwargs)
+    return paths['store'], output
+
+
+@pytest.mark.parametrize('baseline', ['account', 'global'])
+def test_incremental_batches_match_full_processing(tmp_path, baseline):
+    rng = np.random.default_rng(0)
+    first = make_raw(rng, range(200), ['a', 'b', 'c'])
+    # The second batch updates 15 stored reels, adds new ones and a new account
+    second = make_raw(rng, range(185, 215), ['a', 'd'])
+    updated = first.set_index('id').loc[second['id'][:15]]
+    second.loc[:14, 'ownerUsername'] = updated['ownerUsername'].to_numpy()
+    second.loc[:14, 'timestamp'] = updated['timestamp'].to_numpy()
+
+    store, _ = run(first, tmp_path, 'incremental', baseline)
+    run(second, tmp_path, 'incremental', baseline, incremental=True)
+    union = pd.concat([first[~first['id'].isin(second['id'])], second], ignore_index=True)
+    full_store, _ = run(union, tmp_path, 'full', baseline)
+
+    got = store.read().set_index('id').sort_index()
+    expected = full_store.read().set_index('id').sort_index()
+    assert got.index.equals(expected.index)
+    np.testing.assert_allclose(got[Z_COLUMNS], expected[Z_COLUMNS], rtol=1e-9, atol=1e-9)
+    marks = [column for column in expected.columns if column.startswith('mark')]
+    assert marks
+    for column in marks:
+        assert (got[column].astype(str) == expected[column].astype(str)).all(), column
+
+
+def test_incremental_sketches_match_full_processing(tmp_path):
+    rng = np.random.default_rng(2)
+    first = make_raw(rng, range(150), ['a', 'b', 'c'])
+    # Only new reels: 'a' is folded into its stored sketches, 'd' gets new ones
+    second = make_raw(rng, range(150, 180), ['a', 'd'])
+
+    run(first, tmp_path, 'incremental', 'account')
+    run(second, tmp_path, 'incremental', 'account', incremental=True)
+    run(pd.concat([first, second], ignore_index=True), tmp_path, 'full', 'account')
+
+    got = load_sketches(str(tmp_path / 'incremental_sketches.parquet'))
+    expected = load_sketches(str(tmp_path / 'full_sketches.parquet'))
+    assert got.keys() == expected.keys()
+    q = np.linspace(0, 1, 11)
+    for key, sketch in expected.items():
+        np.testing.assert_allclose(got[key].quantile(q), sketch.quantile(q), err_msg=str(key))
+
+
+def test_incremental_keeps_followers_of_accounts_it_was_not_given(tmp_path):
+    rng = np.random.default_rng(3)
+    first = make_raw(rng, range(150), ['a', 'b', 'c'])
+    second = make_raw(rng, range(150, 170), ['a'])
+
+    store, _ = run(first, tmp_path, 'incremental', 'global')
+    process_incremental(second, store=store, baseline='global', followers={'a': FOLLOWERS['a']},
+                        stats_path=str(tmp_path / 'incremental_stats.parquet'),
+                        sketch_path=str(tmp_path / 'incremental_sketches.parquet'),
+                        summary_path=str(tmp_path / 'incremental_summary.parquet'))
+    full_store, _ = run(pd.concat([first, second], ignore_index=True), tmp_path, 'full', 'global')
+
+    got = store.read().set_index('id').sort_index()
+    expected = full_store.read().set_index('id').sort_index()
+    followers = got.groupby('accountName')['followersCount'].first().to_dict()
+    assert followers == {account: FOLLOWERS[account] for account in ['a', 'b', 'c']}
+    np.testing.assert_allclose(got[Z_COLUMNS], expected[Z_COLUMNS], rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('source', ['raw_df', 'store'])
+@pytest.mark.parametrize('baseline', ['account', 'global'])
+def test_sharded_processing_matches_serial(tmp_path, monkeypatch, source, baseline):
+    raw = make_raw(np.random.default_rng(1), range(120), list(FOLLOWERS))
+    if source == 'store':
+        # Worker processes are forked and see the patched reels store
+        root = str(tmp_path / 'reels')
+        reels_store(root).overwrite(raw)
+        monkeypatch.setattr(descriptive_stat, 'reels_store', lambda: reels_store(root))
+        raw = None
+
+    serial_store, serial = run(raw, tmp_path, 'serial', baseline, workers=1)
+    sharded_store, sharded = run(raw, tmp_path, 'sharded', baseline, workers=2, shard_accounts=1)
+
+    pd.testing.assert_frame_equal(sharded, serial)
+    pd.testing.assert_frame_equal(sharded_store.read(), serial_store.read())
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / 'sharded_stats.parquet'),
+                                  pd.read_parquet(tmp_path / 'serial_stats.parquet'))
@@ -0,0 +1,33 @@
+from data_loader.incremental import load_watermarks, scrape_incremental
+from data_loader.storage import reels_store
+from fake_apify import FakeClient
+
+RUN_INPUT = {'username': ['Alpha', 'beta'], 'resultsLimit': 5}
+
+
+def test_mixed_case_accounts_keep_watermarks(tmp_path):
+    store = reels_store(str(tmp_path / 'reels'))
+    state_path = str(tmp_path / 'scrape_state.json')
+    client = FakeClient()
+
+    scrape_incremental(client, RUN_INPUT, store, state_path=state_path)
+    marks = load_watermarks(state_path)
+    assert set(marks) == {'alpha', 'beta'}
+    assert all('onlyPostsNewerThan' not in call for call in client.calls)
+
+    client.calls.clear()
+    scrape_incremental(client, RUN_INPUT, store, state_path=state_path)
+    newer_than = {call['username'][0]: call.get('onlyPostsNewerThan') for call in client.calls}
+    assert newer_than == {'Alpha': marks['alpha']['timestamp'], 'beta': marks['beta']['timestamp']}
+
+
+def test_failed_account_keeps_its_watermark(tmp_path):
+    store = reels_store(str(tmp_path / 'reels'))
+    state_path = str(tmp_path / 'scrape_state.json')
+    scrape_incremental(FakeClient(), {'username': ['Alpha'], 'resultsLimit': 3}, store, state_path=state_path)
+    before = load_watermarks(state_path)
+
+    scrape_incremental(FakeClient(fail_run={'Alpha'}), RUN_INPUT, store, state_path=state_path)
+    after = load_watermarks(state_path)
+    assert after['alpha'] == before['alpha']
+    assert 'beta' in after
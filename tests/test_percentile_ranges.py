@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from data_loader.storage import described_store
+from external_analysis.percentile_ranges import export_percentile_ranges, percentile_range_table, range_stats
+
+
+def brute_force(values, edges):
+    values = values[~np.isnan(values)]
+    counts, sums = [], []
+    for i, (lower, upper) in enumerate(zip(edges[:-1], edges[1:])):
+        top = i == len(edges) - 2
+        mask = (values >= lower) & ((values <= upper) if top else (values < upper))
+        counts.append(mask.sum())
+        sums.append(values[mask].sum())
+    return np.array(counts), np.array(sums)
+
+
+def test_range_stats_match_masks_with_ties_on_edges():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 20, 500).astype('float64')
+    values[rng.choice(500, 20, replace=False)] = np.nan
+    edges = np.array([0.0, 5.0, 5.0, 10.0, 19.0])
+
+    counts, sums = range_stats(values, edges)
+
+    expected_counts, expected_sums = brute_force(values, edges)
+    np.testing.assert_array_equal(counts, expected_counts)
+    np.testing.assert_allclose(sums, expected_sums)
+    assert counts.sum() == np.count_nonzero(~np.isnan(values))
+
+
+def test_table_counts_add_up_and_skip_nan():
+    values = pd.Series(np.r_[np.arange(1.0, 101.0), [np.nan] * 5])
+    table = percentile_range_table(values)
+
+    assert table.index[0] == '100-99' and table.index[-1] == '5-0'
+    assert table['count'].sum() == 100
+    assert table['sum'].sum() == values.sum()
+    assert table.loc['100-99', 'count'] == 1 and table.loc['100-99', 'lower'] == values.quantile(0.99)
+    assert table['countShare'].sum() == 100
+
+
+def test_constant_values_fall_into_the_top_range():
+    table = percentile_range_table([7.0] * 12)
+    assert table.loc['100-99', 'count'] == 12
+    assert table['count'].sum() == 12
+    assert table.loc['100-99', 'sumShare'] == 100
+
+
+def test_empty_values_give_empty_ranges():
+    table = percentile_range_table([np.nan, np.nan])
+    assert (table['count'] == 0).all()
+    assert (table['countShare'] == 0).all() and (table['sumShare'] == 0).all()
+
+
+def test_export_writes_every_account_and_metric(tmp_path):
+    store = described_store(str(tmp_path / 'described'))
+    store.overwrite(pd.DataFrame({
+        'accountName': ['a'] * 10 + ['b'] * 4,
+        'likesCount': np.r_[np.arange(10.0), [1.0, 1.0, 1.0, 1.0]],
+        'commentsCount': np.r_[np.zeros(10), np.arange(4.0)],
+    }))
+    path = str(tmp_path / 'ranges.csv')
+
+    result = export_percentile_ranges(['likesCount', 'commentsCount'], path=path, store=store)
+
+    assert len(result) == 2 * 2 * 8
+    assert result.groupby(['accountName', 'metric'])['count'].sum().to_dict() == {
+        ('a', 'commentsCount'): 10, ('a', 'likesCount'): 10, ('b', 'commentsCount'): 4, ('b', 'likesCount'): 4,
+    }
+    pd.testing.assert_frame_equal(pd.read_csv(path), result, check_dtype=False)
@@ -0,0 +1,37 @@
+import functools
+
+import pandas as pd
+
+import inst_reel_scraper
+import pipeline
+from data_loader.apify_scheduler import ApifyScheduler, TokenBucket, UsageBudget
+from data_loader.run_cache import RunCache
+from data_loader.storage import described_store, reels_store
+from external_analysis import descriptive_stat
+from fake_apify import FakeClient, make_items
+
+
+def test_failed_accounts_stay_in_described_store(tmp_path, monkeypatch):
+    raw_store = reels_store(str(tmp_path / 'reels'))
+    raw_store.overwrite(pd.DataFrame(make_items('alice', 3, tag='old') + make_items('bob', 4, tag='old')))
+    out_store = described_store(str(tmp_path / 'described'))
+
+    monkeypatch.setattr(inst_reel_scraper, 'reels_store', lambda: raw_store)
+    monkeypatch.setattr(descriptive_stat, 'reels_store', lambda: raw_store)
+    monkeypatch.setattr(inst_reel_scraper, 'RunCache', lambda: RunCache(root=str(tmp_path / 'run_cache')))
+    monkeypatch.setattr(pipeline, 'ApifyScheduler', lambda: ApifyScheduler(
+        bucket=TokenBucket(rate=1000, capacity=1000), budget=UsageBudget(path=str(tmp_path / 'usage.json'))))
+    monkeypatch.setattr(pipeline, 'get_follower_counts', lambda accounts, **kwargs: {a: 1000 for a in accounts})
+    monkeypatch.setattr(pipeline, 'process_data', functools.partial(
+        descriptive_stat.process_data, store=out_store, workers=1,
+        stats_path=str(tmp_path / 'stats.parquet'), sketch_path=str(tmp_path / 'sketches.parquet'),
+        summary_path=str(tmp_path / 'summary.parquet')))
+
+    result = pipeline.run_pipeline(['alice', 'bob'], results_limit=5, client=FakeClient(fail_run={'bob'}))
+
+    assert result.ok
+    assert result.scrape_report.failed == ['bob']
+    described = out_store.read()
+    assert sorted(described['accountName'].unique()) == ['alice', 'bob']
+    assert (described.loc[described['accountName'] == 'bob', 'caption'] == 'old').all()
+    assert len(described) == 5 + 4
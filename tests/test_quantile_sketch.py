@@ -0,0 +1,24 @@
+import numpy as np
+
+from external_analysis.quantile_sketch import QuantileSketch, merge_sketches
+
+
+def test_merged_sketches_match_sketch_of_union():
+    values = np.random.default_rng(0).lognormal(8, 1.5, 20_000)
+    parts = [QuantileSketch.from_values(part, exact_max=100) for part in np.array_split(values, 4)]
+
+    merged = merge_sketches(parts + [None], exact_max=100)
+
+    assert merged.count == len(values)
+    assert (merged.min, merged.max) == (values.min(), values.max())
+    q = np.array([0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99])
+    ranks = np.searchsorted(np.sort(values), merged.quantile(q)) / len(values)
+    # Rank error bound of the sketch, with some slack for merging
+    np.testing.assert_array_less(np.abs(ranks - q), 2 * np.pi * np.sqrt(q * (1 - q)) / 100)
+
+
+def test_merged_exact_sketches_stay_exact():
+    a, b = np.arange(10.0), np.arange(10.0, 25.0)
+    merged = merge_sketches([QuantileSketch.from_values(a), QuantileSketch.from_values(b)])
+    assert merged.exact
+    np.testing.assert_array_equal(merged.quantile([0.1, 0.5, 0.9]), np.quantile(np.r_[a, b], [0.1, 0.5, 0.9]))
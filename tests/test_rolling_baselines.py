@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from external_analysis.rolling_baselines import baseline_columns, trailing_baselines
+
+WINDOWS = [7, 30]
+
+
+def naive_baselines(df, metric, window):
+    """Mean and population std of the reels before every reel, one row at a time."""
+    times = pd.to_datetime(df['timestamp'], utc=True)
+    values = pd.to_numeric(df[metric], errors='coerce')
+    means, stds = [], []
+    for i in range(len(df)):
+        if pd.isna(times.iloc[i]) or pd.isna(values.iloc[i]):
+            means.append(np.nan)
+            stds.append(np.nan)
+            continue
+        in_window = (
+            (df['accountName'] == df['accountName'].iloc[i])
+            & times.notna() & values.notna()
+            & (times < times.iloc[i])
+            & (times > times.iloc[i] - pd.Timedelta(days=window))
+        )
+        window_values = values[in_window].to_numpy(dtype='float64')
+        if len(window_values) == 0:
+            means.append(np.nan)
+            stds.append(np.nan)
+            continue
+        means.append(window_values.mean())
+        stds.append(window_values.std() if len(window_values) > 1 else 0.0)
+    return np.array(means), np.array(stds)
+
+
+def make_reels(seed=0, n=300):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-01-01', tz='UTC')
+    df = pd.DataFrame({
+        'accountName': rng.choice(['alpha', 'beta', 'gamma'], n),
+        'timestamp': start + pd.to_timedelta(rng.integers(0, 200 * 24 * 3600, n), unit='s'),
+        'likesCount': rng.integers(0, 5000, n).astype('float64'),
+    })
+    # Duplicate times, missing values and reels without a time
+    df.loc[10:14, 'timestamp'] = df.loc[10, 'timestamp']
+    df.loc[rng.choice(n, 15, replace=False), 'likesCount'] = np.nan
+    df.loc[rng.choice(n, 10, replace=False), 'timestamp'] = pd.NaT
+    return df
+
+
+def test_trailing_baselines_match_naive_windows_with_missing_times():
+    df = make_reels()
+    result = trailing_baselines(df, ['likesCount'], windows=WINDOWS)
+    for window in WINDOWS:
+        expected_mean, expected_std = naive_baselines(df, 'likesCount', window)
+        mean_col, std_col = baseline_columns('likesCount', window)
+        np.testing.assert_allclose(result[mean_col], expected_mean, rtol=1e-9, atol=1e-6)
+        np.testing.assert_allclose(result[std_col], expected_std, rtol=1e-9, atol=1e-6)
+
+
+def test_reels_without_time_get_nan_baselines():
+    df = make_reels(seed=1)
+    result = trailing_baselines(df, ['likesCount'], windows=WINDOWS)
+    no_time = df['timestamp'].isna()
+    assert result.loc[no_time].isna().all().all()
+
+
+def test_reel_is_not_part_of_its_own_baseline():
+    df = pd.DataFrame({
+        'accountName': 'alpha',
+        'timestamp': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-03'], utc=True),
+        'likesCount': [100.0, 200.0, 10_000.0, 50.0],
+    })
+    result = trailing_baselines(df, ['likesCount'], windows=[7])
+    mean_col, std_col = baseline_columns('likesCount', 7)
+    # The first reel has no history; same-time reels don't see each other
+    np.testing.assert_array_equal(result[mean_col], [np.nan, 100.0, 150.0, 150.0])
+    np.testing.assert_array_equal(result[std_col], [np.nan, 0.0, 50.0, 50.0])
@@ -0,0 +1,67 @@
+import os
+import time
+
+from data_loader.run_cache import ENTRY_SUFFIX, RunCache
+from data_loader.scraping_engine import scrape_accounts
+from fake_apify import FakeClient
+
+
+def scrape(client, cache, accounts, refresh=False):
+    return scrape_accounts(client, {'username': accounts, 'resultsLimit': 3}, cache=cache, refresh=refresh,
+                           accounts_per_run=len(accounts))
+
+
+def entries(cache):
+    return sorted(name for name in os.listdir(cache.root) if name.endswith(ENTRY_SUFFIX))
+
+
+def set_age(path, seconds):
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_cache_hit_skips_actor_call(tmp_path):
+    cache = RunCache(root=str(tmp_path))
+    client = FakeClient()
+    scrape(client, cache, ['Alpha', 'beta'])
+
+    # The same accounts in another case and order hit the cache
+    report = scrape(client, cache, ['Beta', 'alpha'])
+    assert len(client.calls) == 1
+    assert report.results['alpha'].cached
+    assert report.results['Beta'].items_count == 3
+
+    scrape(client, cache, ['alpha', 'beta'], refresh=True)
+    assert len(client.calls) == 2
+
+
+def test_expired_entry_is_scraped_again(tmp_path):
+    cache = RunCache(root=str(tmp_path), ttl_seconds=60)
+    client = FakeClient()
+    scrape(client, cache, ['alpha'])
+    [name] = entries(cache)
+    set_age(os.path.join(cache.root, name), 120)
+
+    report = scrape(client, cache, ['alpha'])
+    assert len(client.calls) == 2
+    assert not report.results['alpha'].cached
+
+
+def test_oldest_entries_are_evicted_first(tmp_path):
+    cache = RunCache(root=str(tmp_path))
+    client = FakeClient()
+    names = {}
+    for age, account in [(300, 'alpha'), (200, 'beta'), (100, 'gamma')]:
+        before = set(entries(cache))
+        scrape(client, cache, [account])
+        [names[account]] = set(entries(cache)) - before
+        set_age(os.path.join(cache.root, names[account]), age)
+
+    sizes = {account: os.path.getsize(os.path.join(cache.root, name)) for account, name in names.items()}
+    cache.max_bytes = sizes['beta'] + sizes['gamma']
+    cache.evict()
+    assert entries(cache) == sorted([names['beta'], names['gamma']])
+
+    cache.max_bytes = sizes['gamma']
+    cache.evict()
+    assert entries(cache) == [names['gamma']]
@@ -0,0 +1,38 @@
+from data_loader.apify_scheduler import ApifyScheduler, TokenBucket, UsageBudget
+from data_loader.scraping_engine import scrape_accounts, split_accounts
+from fake_apify import FakeClient
+
+
+def test_split_accounts_drops_duplicates():
+    assert split_accounts(['a', 'b', 'a', 'c'], accounts_per_run=2) == [['a', 'b'], ['c']]
+
+
+def test_mixed_succeeded_and_failed_groups():
+    client = FakeClient(fail_run={'beta'}, fail_mid_stream={'gamma'})
+    run_input = {'username': ['alpha', 'beta', 'gamma', 'delta'], 'resultsLimit': 10}
+    reported = []
+
+    report = scrape_accounts(client, run_input, accounts_per_run=1, page_size=4, on_result=reported.extend)
+
+    assert sorted(report.succeeded) == ['alpha', 'delta']
+    assert sorted(report.failed) == ['beta', 'gamma']
+    assert report.skipped == []
+    assert sorted(r.account for r in reported) == ['alpha', 'beta', 'delta', 'gamma']
+    # Only the reels of the succeeded groups are collected, none of the partial group
+    assert sorted({item['ownerUsername'] for item in report.items}) == ['alpha', 'delta']
+    assert len(report.items) == 20
+    assert report.results['alpha'].items_count == 10
+    assert 'actor failed' in report.results['beta'].error
+
+
+def test_runs_over_budget_are_skipped(tmp_path):
+    # One run of 10 reels fits the budget, the second does not
+    budget = UsageBudget(path=str(tmp_path / 'usage.json'), monthly_limit=0.05)
+    scheduler = ApifyScheduler(bucket=TokenBucket(rate=1000, capacity=1000), budget=budget)
+    run_input = {'username': ['alpha', 'beta'], 'resultsLimit': 10}
+
+    report = scrape_accounts(FakeClient(), run_input, accounts_per_run=1, max_concurrency=1, scheduler=scheduler)
+
+    assert report.succeeded == ['alpha']
+    assert report.skipped == ['beta']
+    assert report.failed == []